@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from SOSGame import SOSGame, SimpleGame, GeneralGame
-from player import HumanPlayer, ComputerPlayer
+from player import HumanPlayer, ComputerPlayer, SearchPlayer
 from game_recorder import GameRecorder
 from game_replayer import GameReplayer
 from llm_player import LLMPlayer
@@ -33,6 +33,7 @@ class SOSGUI:
         self.replayer = GameReplayer()
         self.replay_mode = False
         self.replay_speed = REPLAY_SPEED_MS
+        self.ponder_player = None
 
         self._create_widgets()
         self._create_board()
@@ -103,6 +104,9 @@ class SOSGUI:
         tk.Radiobutton(
             frame, text="Computer", variable=player_type_var, value="Computer"
         ).pack()
+        tk.Radiobutton(
+            frame, text="Search", variable=player_type_var, value="Search"
+        ).pack()
         tk.Radiobutton(frame, text="LLM", variable=player_type_var, value="LLM").pack()
 
         # Score label
@@ -220,10 +224,27 @@ class SOSGUI:
                         self.turn_label.config(
                             text=f"Current turn: {self.game.current_player}"
                         )
+                        self._start_pondering(player)
                         self._check_computer_turn()
                     else:
                         self._show_game_over()
 
+    # Let a search player think while a human or LLM opponent is to move.
+    # Computer opponents would compete with it for the interpreter.
+    def _start_pondering(self, player):
+        opponent = self.game.get_current_player_object()
+        if isinstance(player, SearchPlayer) and not isinstance(
+            opponent, ComputerPlayer
+        ):
+            player.ponder(self.game)
+            self.ponder_player = player
+
+    # Stop any background thinking left over from the last game.
+    def _stop_pondering(self):
+        if self.ponder_player is not None:
+            self.ponder_player.stop_pondering()
+            self.ponder_player = None
+
     # Draw lines through SOS sequences
     def _draw_sos_lines(self):
         # Clear existing lines
@@ -316,8 +337,9 @@ class SOSGUI:
     # Start new game with current settings.
     def _new_game(self):
         try:
-            # Stop replay mode if active
+            # Stop replay mode and leftover pondering if active
             self.replay_mode = False
+            self._stop_pondering()
 
             board_size = int(self.board_size_var.get())
             if board_size < 3:
@@ -332,6 +354,8 @@ class SOSGUI:
                 blue_player = HumanPlayer("blue")
             elif self.blue_player_type.get() == "LLM":
                 blue_player = LLMPlayer("blue")
+            elif self.blue_player_type.get() == "Search":
+                blue_player = SearchPlayer("blue")
             else:
                 blue_player = ComputerPlayer("blue")
 
@@ -339,6 +363,8 @@ class SOSGUI:
                 red_player = HumanPlayer("red")
             elif self.red_player_type.get() == "LLM":
                 red_player = LLMPlayer("red")
+            elif self.red_player_type.get() == "Search":
+                red_player = SearchPlayer("red")
             else:
                 red_player = ComputerPlayer("red")
 
@@ -388,6 +414,7 @@ class SOSGUI:
 
         try:
             # Load the recording
+            self._stop_pondering()
             self.replayer.load_game(filepath)
             config = self.replayer.get_game_config()
 
@@ -1,7 +1,180 @@
 # Game logic for SOS game.
+import random
+import struct
+from array import array
+from operator import xor
+
+# Cell codes stored in the flat board.
+EMPTY_CODE = 0
+S_CODE = 1
+O_CODE = 2
+
+MASK_64 = (1 << 64) - 1
+
+
+# Mix an integer into a well-distributed 64-bit value (SplitMix64).
+def splitmix64(value):
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+# Zobrist keys for everything besides the cells. They are derived from fixed
+# inputs so hashes are identical across runs and processes.
+ZOBRIST_SIDE_KEY = splitmix64(1 << 62)
+ZOBRIST_SIMPLE_KEY = splitmix64((1 << 62) + 1)
+ZOBRIST_GENERAL_KEY = splitmix64((1 << 62) + 2)
+
+
+# Zobrist key for a board size, so equal boards of different sizes differ.
+def zobrist_size_key(size):
+    return splitmix64((2 << 62) + size)
+
+
+# Zobrist key for a letter code at a flat cell index.
+def zobrist_cell_key(index, code):
+    return splitmix64(index * 4 + code)
+
+
+# The 8 rotations and reflections of a square board, numbered 0 (identity),
+# 1-3 (rotations by 90, 180 and 270 degrees), 4-5 (horizontal and vertical
+# mirror) and 6-7 (main and anti-diagonal mirror).
+SYMMETRY_COUNT = 8
+SYMMETRY_INVERSES = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+# Map a cell to where a symmetry moves it on a board of the given size.
+def transform_cell(row, col, size, symmetry):
+    last = size - 1
+    if symmetry == 0:
+        return row, col
+    if symmetry == 1:
+        return col, last - row
+    if symmetry == 2:
+        return last - row, last - col
+    if symmetry == 3:
+        return last - col, row
+    if symmetry == 4:
+        return row, last - col
+    if symmetry == 5:
+        return last - row, col
+    if symmetry == 6:
+        return col, row
+    if symmetry == 7:
+        return last - col, last - row
+    raise ValueError(f"Invalid symmetry: {symmetry}")
+
+
+# Board storage for the sparse backend: only occupied cells are kept and
+# missing cells read as empty. Writing the empty code removes the cell.
+class SparseCells(dict):
+    __slots__ = ()
+
+    def __missing__(self, index):
+        return EMPTY_CODE
+
+    def __setitem__(self, index, code):
+        if code == EMPTY_CODE:
+            self.pop(index, None)
+        else:
+            dict.__setitem__(self, index, code)
+
+    def copy(self):
+        return SparseCells(self)
+
+
+# Per-game table filled in one cell at a time, for boards too large to
+# precompute. Values come from build(index) on first access.
+class LazyCellTable(dict):
+    __slots__ = ("_build",)
+
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+
+    def __missing__(self, index):
+        value = self._build(index)
+        self[index] = value
+        return value
+
+
+# Get the SOS lines through a cell as (from_s, around_o, near): the (O, S)
+# cells completing an SOS that starts there, the (S, S) cells around it when
+# it is the middle O, both as flat indices in DIRECTIONS order, and every
+# cell sharing a line with it.
+def cell_lines(row, col, size):
+    from_s = []
+    around_o = []
+    for dr, dc in SOSGame.DIRECTIONS:
+        r2, c2 = row + 2 * dr, col + 2 * dc
+        if 0 <= r2 < size and 0 <= c2 < size:
+            from_s.append(((row + dr) * size + col + dc, r2 * size + c2))
+        r_before, c_before = row - dr, col - dc
+        r_after, c_after = row + dr, col + dc
+        if (
+            0 <= r_before < size
+            and 0 <= c_before < size
+            and 0 <= r_after < size
+            and 0 <= c_after < size
+        ):
+            around_o.append((r_before * size + c_before, r_after * size + c_after))
+    near = tuple(sorted({index for pair in from_s + around_o for index in pair}))
+    return tuple(from_s), tuple(around_o), near
+
+
+# Get the canonical form of a flat board as (bytes, symmetry): the
+# lexicographically smallest of its 8 symmetric images and the symmetry
+# producing it. Symmetric boards share the same canonical bytes.
+def canonical_cells(cells, size):
+    best = None
+    best_symmetry = 0
+    for symmetry, inverse_map in enumerate(SOSGame._symmetry_maps(size)[1]):
+        image = bytes(cells[index] for index in inverse_map)
+        if best is None or image < best:
+            best = image
+            best_symmetry = symmetry
+    return best, best_symmetry
+
+
+# Header of SOSGame.to_bytes(): magic, format version, mode code, backend
+# code, board size, side to move, game over, winner code, blue and red score.
+STATE_HEADER = struct.Struct("<2sBBBIBBBII")
+STATE_MAGIC = b"SG"
+STATE_VERSION = 1
+# Occupied cell entry in a sparse board's to_bytes(): flat index and code.
+SPARSE_CELL = struct.Struct("<IB")
 
 
 class SOSGame:
+    __slots__ = (
+        "_board_size",
+        "_board_backend",
+        "_cells",
+        "_s_lines",
+        "_o_lines",
+        "_near",
+        "_empty_count",
+        "_free",
+        "_free_pos",
+        "_threats",
+        "_threat_dirty",
+        "_zobrist",
+        "_hash",
+        "_sym_keys",
+        "_sym_hashes",
+        "_sym_pending",
+        "_current_player",
+        "_blue_score",
+        "_red_score",
+        "_game_over",
+        "_winner",
+        "_sos_lines",
+        "_blue_player",
+        "_red_player",
+        "_move_history",
+        "_undo_stack",
+    )
     EMPTY = ""
     LETTER_S = "S"
     LETTER_O = "O"
@@ -9,6 +182,18 @@ class SOSGame:
     RED = "red"
     SIMPLE = "Simple"
     GENERAL = "General"
+    LIST_BOARD = "list"
+    ARRAY_BOARD = "array"
+    SPARSE_BOARD = "sparse"
+    BOARD_BACKENDS = (LIST_BOARD, ARRAY_BOARD, SPARSE_BOARD)
+    LETTER_CODES = {EMPTY: EMPTY_CODE, LETTER_S: S_CODE, LETTER_O: O_CODE}
+    CODE_LETTERS = (EMPTY, LETTER_S, LETTER_O)
+    _LINE_TABLES = {}
+    _ZOBRIST_TABLES = {}
+    _SYMMETRY_TABLES = {}
+    _SYMMETRIC_ZOBRIST_TABLES = {}
+    _ZOBRIST_MODE_KEY = 0
+    _MODE_CODE = 0
     DIRECTIONS = [
         (0, 1),
         (0, -1),
@@ -20,14 +205,17 @@ class SOSGame:
         (1, -1),
     ]
 
-    # Initialize game with board size and mode.
-    def __init__(self, board_size=8, blue_player=None, red_player=None):
+    # Initialize game with board size, players and board backend.
+    def __init__(
+        self, board_size=8, blue_player=None, red_player=None, board_backend=LIST_BOARD
+    ):
         if board_size < 3:
             raise ValueError("Board size must be at least 3")
+        if board_backend not in self.BOARD_BACKENDS:
+            raise ValueError(f"Unknown board backend: {board_backend}")
         self._board_size = board_size
-        self._board = [
-            [self.EMPTY for _ in range(board_size)] for _ in range(board_size)
-        ]
+        self._board_backend = board_backend
+        self._reset_board()
         self._current_player = self.BLUE
         self._blue_score = 0
         self._red_score = 0
@@ -37,11 +225,20 @@ class SOSGame:
         self._blue_player = blue_player
         self._red_player = red_player
         self._move_history = []
+        self._undo_stack = []
 
     @property
     def board_size(self):
         return self._board_size
 
+    @property
+    def board_backend(self):
+        return self._board_backend
+
+    @property
+    def empty_count(self):
+        return self._empty_count
+
     @property
     def current_player(self):
         return self._current_player
@@ -70,106 +267,497 @@ class SOSGame:
     def move_history(self):
         return self._move_history
 
+    # Zobrist hash of board, side to move, mode and board size.
+    @property
+    def position_hash(self):
+        return self._hash
+
+    # Zobrist hashes of the position under each of the 8 board symmetries,
+    # in symmetry order; the first one is position_hash.
+    @property
+    def symmetric_hashes(self):
+        self._sync_symmetric()
+        extras = self._hash ^ self._sym_hashes[0]
+        return tuple(board_hash ^ extras for board_hash in self._sym_hashes)
+
+    # Hash shared by all 8 symmetric images of the position.
+    @property
+    def canonical_hash(self):
+        self._sync_symmetric()
+        return min(self._sym_hashes) ^ self._hash ^ self._sym_hashes[0]
+
+    # Symmetry that maps this position onto its canonical image.
+    @property
+    def canonical_symmetry(self):
+        self._sync_symmetric()
+        return self._sym_hashes.index(min(self._sym_hashes))
+
+    # Get the canonical board as (bytes, symmetry), see canonical_cells.
+    # Not available for sparse boards, which are too large to image densely;
+    # use canonical_hash instead.
+    def canonical_form(self):
+        if self._board_backend == self.SPARSE_BOARD:
+            raise ValueError("Canonical board form is not available for sparse boards")
+        return canonical_cells(self._cells, self._board_size)
+
+    @property
+    def can_unmake(self):
+        return len(self._undo_stack) > 0
+
     def get_current_player_object(self):
         return (
             self._blue_player if self._current_player == self.BLUE else self._red_player
         )
 
+    # Allocate an empty flat board for the selected backend.
+    def _new_cells(self):
+        cell_count = self._board_size * self._board_size
+        if self._board_backend == self.ARRAY_BOARD:
+            return bytearray(cell_count)
+        if self._board_backend == self.SPARSE_BOARD:
+            return SparseCells()
+        return [EMPTY_CODE] * cell_count
+
+    # Clear the board and the set of free cells.
+    def _reset_board(self):
+        cell_count = self._board_size * self._board_size
+        self._cells = self._new_cells()
+        self._empty_count = cell_count
+        # Free cell indices plus each index's slot in that array, so cells
+        # can be removed and restored in constant time. Built by
+        # _free_cells() when first needed; sparse boards never build them.
+        self._free = None
+        self._free_pos = None
+        if self._board_backend == self.SPARSE_BOARD:
+            self._sparse_tables()
+        else:
+            self._s_lines, self._o_lines, self._near = self._line_tables(
+                self._board_size
+            )
+            self._zobrist = self._zobrist_tables(self._board_size)
+            # Built by the first _sync_symmetric(), since most games never
+            # ask for symmetric hashes.
+            self._sym_keys = None
+        # Cells where S or O would score right now, with the SOS count, indexed
+        # by letter code. Refreshed lazily around cells changed since the last
+        # query.
+        self._threats = (None, {}, {})
+        self._threat_dirty = set()
+        self._hash = zobrist_size_key(self._board_size) ^ self._ZOBRIST_MODE_KEY
+        # Board-only hashes of the 8 symmetric images of the position, and
+        # the cell changes not folded into them yet, as index * 4 + code.
+        # Moves only queue a change, since most positions are never asked
+        # for their symmetric hashes; a move taken back before then cancels
+        # its queued change.
+        self._sym_hashes = (0,) * SYMMETRY_COUNT
+        self._sym_pending = []
+
     # Get content of a cell.
     def get_cell(self, row, col):
         if not (0 <= row < self._board_size and 0 <= col < self._board_size):
             raise ValueError(f"Invalid position: ({row}, {col})")
-        return self._board[row][col]
+        return self.CODE_LETTERS[self._cells[row * self._board_size + col]]
 
     # Place a letter on the board.
     def make_move(self, row, col, letter):
-        if self._game_over:
+        if self._game_over or not self._is_valid_move(row, col, letter):
             return False
-        if not self._is_valid_move(row, col, letter):
-            return False
-        self._board[row][col] = letter
+        self._place(row, col, letter)
+        self._move_history.append(
+            {"row": row, "col": col, "letter": letter, "player": self._current_player}
+        )
         self._switch_player()
         return True
 
+    # Write a letter into the flat board, saving what unmake_move needs.
+    # Does what _load_cell does, inlined since every move comes through here.
+    def _place(self, row, col, letter):
+        index = row * self._board_size + col
+        code = self.LETTER_CODES[letter]
+        self._undo_stack.append(
+            (
+                index,
+                self._current_player,
+                self._blue_score,
+                self._red_score,
+                len(self._sos_lines),
+                len(self._move_history),
+                self._hash,
+            )
+        )
+        self._cells[index] = code
+        self._empty_count -= 1
+        free = self._free
+        if free is not None:
+            free_pos = self._free_pos
+            slot = free_pos[index]
+            last = free.pop()
+            if last != index:
+                free[slot] = last
+                free_pos[last] = slot
+        self._threat_dirty.add(index)
+        self._hash ^= self._zobrist[code][index]
+        self._sym_pending.append(index * 4 + code)
+
+    # Put a letter code on the board without recording a move.
+    def _load_cell(self, index, code):
+        self._cells[index] = code
+        self._empty_count -= 1
+        if self._free is not None:
+            self._remove_free(index)
+        self._threat_dirty.add(index)
+        self._hash ^= self._zobrist[code][index]
+        self._sym_pending.append(index * 4 + code)
+
+    # Take back the last move, restoring board, scores, lines and turn.
+    def unmake_move(self):
+        if not self._undo_stack:
+            return False
+        (
+            index,
+            player,
+            blue_score,
+            red_score,
+            line_count,
+            history_length,
+            self._hash,
+        ) = self._undo_stack.pop()
+        change = index * 4 + self._cells[index]
+        pending = self._sym_pending
+        if pending and pending[-1] == change:
+            pending.pop()
+        else:
+            # Removing a letter flips the same keys as placing it.
+            pending.append(change)
+        self._cells[index] = EMPTY_CODE
+        self._empty_count += 1
+        if self._free is not None:
+            self._free_pos[index] = len(self._free)
+            self._free.append(index)
+        self._threat_dirty.add(index)
+        self._current_player = player
+        self._blue_score = blue_score
+        self._red_score = red_score
+        del self._sos_lines[line_count:]
+        del self._move_history[history_length:]
+        self._game_over = False
+        self._winner = None
+        return True
+
+    # Fold queued cell changes into the symmetric hashes.
+    def _sync_symmetric(self):
+        pending = self._sym_pending
+        if not pending:
+            return
+        sym_keys = self._sym_keys
+        if sym_keys is None:
+            sym_keys = self._sym_keys = self._symmetric_zobrist_tables(self._board_size)
+        hashes = self._sym_hashes
+        for change in pending:
+            index, code = divmod(change, 4)
+            hashes = tuple(map(xor, hashes, sym_keys[code][index]))
+        self._sym_hashes = hashes
+        pending.clear()
+
+    # Remove a cell from the free set by swapping it with the last entry.
+    def _remove_free(self, index):
+        free = self._free
+        slot = self._free_pos[index]
+        last = free.pop()
+        if last != index:
+            free[slot] = last
+            self._free_pos[last] = slot
+
+    # Count SOS that placing a letter code at a flat index would form now.
+    def _count_sos(self, index, code):
+        cells = self._cells
+        count = 0
+        if code == S_CODE:
+            for middle, end in self._s_lines[index]:
+                if cells[middle] == O_CODE and cells[end] == S_CODE:
+                    count += 1
+        else:
+            for before, after in self._o_lines[index]:
+                if cells[before] == S_CODE and cells[after] == S_CODE:
+                    count += 1
+        return count
+
+    # Bring the threat index up to date around cells changed since last use.
+    def _sync_threats(self):
+        if not self._threat_dirty:
+            return
+        affected = set()
+        near = self._near
+        for index in self._threat_dirty:
+            affected.add(index)
+            affected.update(near[index])
+        self._threat_dirty.clear()
+        cells = self._cells
+        _, s_threats, o_threats = self._threats
+        for index in affected:
+            if cells[index] != EMPTY_CODE:
+                s_threats.pop(index, None)
+                o_threats.pop(index, None)
+                continue
+            for code, threats in ((S_CODE, s_threats), (O_CODE, o_threats)):
+                count = self._count_sos(index, code)
+                if count:
+                    threats[index] = count
+                else:
+                    threats.pop(index, None)
+
+    # Get how many SOS placing a letter at (row, col) would form right now.
+    def sos_count_at(self, row, col, letter):
+        self._sync_threats()
+        code = self.LETTER_CODES[letter]
+        return self._threats[code].get(row * self._board_size + col, 0)
+
+    # Get every move that would form an SOS as (row, col, letter, count).
+    # These are scoring moves for the side to move and the cells the other
+    # side needs to block.
+    def scoring_moves(self):
+        self._sync_threats()
+        size = self._board_size
+        moves = []
+        for code in (S_CODE, O_CODE):
+            letter = self.CODE_LETTERS[code]
+            for index, count in self._threats[code].items():
+                row, col = divmod(index, size)
+                moves.append((row, col, letter, count))
+        return moves
+
+    # Get the move forming the most SOS, or None if nothing scores.
+    def best_scoring_move(self):
+        best = None
+        best_count = 0
+        for row, col, letter, count in self.scoring_moves():
+            if count > best_count:
+                best = (row, col, letter)
+                best_count = count
+        return best
+
+    # Get all empty cells as (row, col) pairs.
+    # Sparse boards have no free-cell set, so this scans the whole board.
+    def legal_moves(self):
+        size = self._board_size
+        return [divmod(index, size) for index in self._free_indices()]
+
+    # Get the free cell array of a dense board, building it on first use,
+    # or None for a sparse board.
+    def _free_cells(self):
+        if self._free is None and self._board_backend != self.SPARSE_BOARD:
+            cells = self._cells
+            free = array("i", (i for i, code in enumerate(cells) if code == EMPTY_CODE))
+            free_pos = array("i", [0]) * len(cells)
+            for slot, index in enumerate(free):
+                free_pos[index] = slot
+            self._free = free
+            self._free_pos = free_pos
+        return self._free
+
+    # Get the flat indices of all empty cells.
+    def _free_indices(self):
+        free = self._free_cells()
+        if free is not None:
+            return free
+        cells = self._cells
+        return [
+            index
+            for index in range(self._board_size * self._board_size)
+            if index not in cells
+        ]
+
+    # Get the i-th empty cell, in no particular order.
+    def empty_cell(self, i):
+        return divmod(self._free_indices()[i], self._board_size)
+
+    # Pick a uniformly random empty cell, or None if the board is full.
+    # Mostly empty sparse boards are sampled by retrying random cells.
+    def random_empty_cell(self, rng=random):
+        if self._empty_count == 0:
+            return None
+        free = self._free_cells()
+        if free is not None:
+            return divmod(rng.choice(free), self._board_size)
+        cell_count = self._board_size * self._board_size
+        if self._empty_count * 2 >= cell_count:
+            while True:
+                index = rng.randrange(cell_count)
+                if index not in self._cells:
+                    return divmod(index, self._board_size)
+        return divmod(rng.choice(self._free_indices()), self._board_size)
+
     # Check if move is valid.
     def _is_valid_move(self, row, col, letter):
-        if not (0 <= row < self._board_size and 0 <= col < self._board_size):
+        size = self._board_size
+        if not (0 <= row < size and 0 <= col < size):
             return False
-        if self._board[row][col] != self.EMPTY:
+        if letter != "S" and letter != "O":
             return False
-        if letter not in [self.LETTER_S, self.LETTER_O]:
-            return False
-        return True
+        return self._cells[row * size + col] == EMPTY_CODE
 
     # Switch to other player.
     def _switch_player(self):
         self._current_player = (
             self.RED if self._current_player == self.BLUE else self.BLUE
         )
+        self._hash ^= ZOBRIST_SIDE_KEY
 
     # Detect SOS sequences formed by placing a letter at (row, col).
-    def _detect_sos(self, row, col):
-        letter = self._board[row][col]
-        if letter == self.LETTER_S:
-            return self._detect_sos_from_s(row, col)
-        elif letter == self.LETTER_O:
-            return self._detect_sos_from_o(row, col)
+    # Uses the letter on the board unless one is given to probe with.
+    def _detect_sos(self, row, col, letter=None):
+        index = row * self._board_size + col
+        if letter is None:
+            code = self._cells[index]
+        else:
+            code = self.LETTER_CODES[letter]
+        if code == S_CODE:
+            return self._detect_sos_from_s(index)
+        elif code == O_CODE:
+            return self._detect_sos_from_o(index)
         return []
 
     # Detect SOS sequences where S is at the start.
-    def _detect_sos_from_s(self, row, col):
+    def _detect_sos_from_s(self, index):
+        cells = self._cells
+        size = self._board_size
         sequences = []
-        for dr, dc in self.DIRECTIONS:
-            r1, c1 = row + dr, col + dc
-            r2, c2 = row + 2 * dr, col + 2 * dc
-            if self._is_valid_position(r1, c1) and self._is_valid_position(r2, c2):
-                if (
-                    self._board[r1][c1] == self.LETTER_O
-                    and self._board[r2][c2] == self.LETTER_S
-                ):
-                    sequences.append(((row, col), (r1, c1), (r2, c2)))
+        for middle, end in self._s_lines[index]:
+            if cells[middle] == O_CODE and cells[end] == S_CODE:
+                sequences.append(
+                    (divmod(index, size), divmod(middle, size), divmod(end, size))
+                )
         return sequences
 
     # Detect SOS sequences where O is in the middle.
-    def _detect_sos_from_o(self, row, col):
+    def _detect_sos_from_o(self, index):
+        cells = self._cells
+        size = self._board_size
         sequences = []
-        for dr, dc in self.DIRECTIONS:
-            r_before, c_before = row - dr, col - dc
-            r_after, c_after = row + dr, col + dc
-            if self._is_valid_position(r_before, c_before) and self._is_valid_position(
-                r_after, c_after
-            ):
-                if (
-                    self._board[r_before][c_before] == self.LETTER_S
-                    and self._board[r_after][c_after] == self.LETTER_S
-                ):
-                    sequences.append(
-                        ((r_before, c_before), (row, col), (r_after, c_after))
-                    )
+        for before, after in self._o_lines[index]:
+            if cells[before] == S_CODE and cells[after] == S_CODE:
+                sequences.append(
+                    (divmod(before, size), divmod(index, size), divmod(after, size))
+                )
         return sequences
 
+    # Get the SOS line tables for a board size, building them on first use.
+    # Each table holds one cell_lines() component per flat index. Tables are
+    # shared by all games of a size.
+    @classmethod
+    def _line_tables(cls, size):
+        tables = cls._LINE_TABLES.get(size)
+        if tables is None:
+            lines = [
+                cell_lines(row, col, size) for row in range(size) for col in range(size)
+            ]
+            tables = tuple(tuple(component) for component in zip(*lines))
+            cls._LINE_TABLES[size] = tables
+        return tables
+
+    # Build per-game lazy line, Zobrist and symmetry key tables for the
+    # sparse backend, so memory grows with the cells actually touched.
+    def _sparse_tables(self):
+        size = self._board_size
+
+        all_lines = LazyCellTable(lambda index: cell_lines(*divmod(index, size), size))
+
+        def lines(component):
+            return LazyCellTable(lambda index: all_lines[index][component])
+
+        def keys(code):
+            return LazyCellTable(lambda index: zobrist_cell_key(index, code))
+
+        def symmetric_keys(code):
+            def build(index):
+                row, col = divmod(index, size)
+                images = []
+                for symmetry in range(SYMMETRY_COUNT):
+                    image_row, image_col = transform_cell(row, col, size, symmetry)
+                    images.append(zobrist_cell_key(image_row * size + image_col, code))
+                return tuple(images)
+
+            return LazyCellTable(build)
+
+        self._s_lines, self._o_lines, self._near = lines(0), lines(1), lines(2)
+        self._zobrist = (None, keys(S_CODE), keys(O_CODE))
+        self._sym_keys = (None, symmetric_keys(S_CODE), symmetric_keys(O_CODE))
+
+    # Get the Zobrist key tables for a board size, indexed by letter code
+    # and then flat index. Tables are shared by all games of a size.
+    @classmethod
+    def _zobrist_tables(cls, size):
+        tables = cls._ZOBRIST_TABLES.get(size)
+        if tables is None:
+            cell_count = size * size
+            tables = (
+                None,
+                tuple(zobrist_cell_key(index, S_CODE) for index in range(cell_count)),
+                tuple(zobrist_cell_key(index, O_CODE) for index in range(cell_count)),
+            )
+            cls._ZOBRIST_TABLES[size] = tables
+        return tables
+
+    # Get the symmetry tables for a board size as (maps, inverse maps). Each
+    # map sends a flat index to its image under one symmetry; inverse maps
+    # give the source index for each image index. Shared by all games of a
+    # size.
+    @classmethod
+    def _symmetry_maps(cls, size):
+        tables = cls._SYMMETRY_TABLES.get(size)
+        if tables is None:
+            maps = []
+            for symmetry in range(SYMMETRY_COUNT):
+                cell_map = []
+                for row in range(size):
+                    for col in range(size):
+                        image_row, image_col = transform_cell(row, col, size, symmetry)
+                        cell_map.append(image_row * size + image_col)
+                maps.append(tuple(cell_map))
+            inverse_maps = tuple(maps[inverse] for inverse in SYMMETRY_INVERSES)
+            tables = (tuple(maps), inverse_maps)
+            cls._SYMMETRY_TABLES[size] = tables
+        return tables
+
+    # Get, per letter code and flat index, the Zobrist keys of the cell's
+    # images under the 8 symmetries. Shared by all games of a size.
+    @classmethod
+    def _symmetric_zobrist_tables(cls, size):
+        tables = cls._SYMMETRIC_ZOBRIST_TABLES.get(size)
+        if tables is None:
+            maps = cls._symmetry_maps(size)[0]
+            zobrist = cls._zobrist_tables(size)
+            tables = (None,) + tuple(
+                tuple(
+                    tuple(keys[cell_map[index]] for cell_map in maps)
+                    for index in range(size * size)
+                )
+                for keys in zobrist[1:]
+            )
+            cls._SYMMETRIC_ZOBRIST_TABLES[size] = tables
+        return tables
+
     # Check if a position is within board boundaries.
     def _is_valid_position(self, row, col):
         return 0 <= row < self._board_size and 0 <= col < self._board_size
 
     # Check if board is full.
     def _is_board_full(self):
-        for row in range(self._board_size):
-            for col in range(self._board_size):
-                if self._board[row][col] == self.EMPTY:
-                    return False
-        return True
+        return self._empty_count == 0
 
     # Reset game with optional new settings.
-    def reset_game(self, board_size=None, blue_player=None, red_player=None):
+    def reset_game(
+        self, board_size=None, blue_player=None, red_player=None, board_backend=None
+    ):
         if board_size is not None:
             if board_size < 3:
                 raise ValueError("Board size must be at least 3")
             self._board_size = board_size
-        self._board = [
-            [self.EMPTY for _ in range(self._board_size)]
-            for _ in range(self._board_size)
-        ]
+        if board_backend is not None:
+            if board_backend not in self.BOARD_BACKENDS:
+                raise ValueError(f"Unknown board backend: {board_backend}")
+            self._board_backend = board_backend
+        self._reset_board()
         self._current_player = self.BLUE
         self._blue_score = 0
         self._red_score = 0
@@ -177,16 +765,132 @@ class SOSGame:
         self._winner = None
         self._sos_lines = []
         self._move_history = []
+        self._undo_stack = []
         if blue_player is not None:
             self._blue_player = blue_player
         if red_player is not None:
             self._red_player = red_player
 
+    # Copy the position for independent play, e.g. by a search thread.
+    # The copy shares players and lookup tables; its move history, SOS lines
+    # and undo stack start empty, so it cannot unmake past this point.
+    def clone(self):
+        other = object.__new__(type(self))
+        other._board_size = self._board_size
+        other._board_backend = self._board_backend
+        other._cells = self._cells.copy()
+        other._s_lines = self._s_lines
+        other._o_lines = self._o_lines
+        other._near = self._near
+        other._empty_count = self._empty_count
+        if self._free is None:
+            other._free = None
+            other._free_pos = None
+        else:
+            other._free = self._free[:]
+            other._free_pos = self._free_pos[:]
+        other._threats = (None, dict(self._threats[1]), dict(self._threats[2]))
+        other._threat_dirty = set(self._threat_dirty)
+        other._zobrist = self._zobrist
+        other._hash = self._hash
+        other._sym_keys = self._sym_keys
+        other._sym_hashes = self._sym_hashes
+        other._sym_pending = self._sym_pending[:]
+        other._current_player = self._current_player
+        other._blue_score = self._blue_score
+        other._red_score = self._red_score
+        other._game_over = self._game_over
+        other._winner = self._winner
+        other._sos_lines = []
+        other._blue_player = self._blue_player
+        other._red_player = self._red_player
+        other._move_history = []
+        other._undo_stack = []
+        return other
+
+    # Serialize the position: mode, board, scores, side to move and result.
+    # Dense boards store one byte per cell, sparse boards one index and code
+    # per occupied cell. Players, move history and SOS lines are not included.
+    def to_bytes(self):
+        header = STATE_HEADER.pack(
+            STATE_MAGIC,
+            STATE_VERSION,
+            self._MODE_CODE,
+            self.BOARD_BACKENDS.index(self._board_backend),
+            self._board_size,
+            0 if self._current_player == self.BLUE else 1,
+            self._game_over,
+            (None, self.BLUE, self.RED).index(self._winner),
+            self._blue_score,
+            self._red_score,
+        )
+        if self._board_backend == self.SPARSE_BOARD:
+            return header + b"".join(
+                SPARSE_CELL.pack(index, code) for index, code in self._cells.items()
+            )
+        return header + bytes(self._cells)
+
+    # Rebuild a game written by to_bytes, as the matching game mode class.
+    @staticmethod
+    def from_bytes(data):
+        (
+            magic,
+            version,
+            mode_code,
+            backend_code,
+            board_size,
+            side,
+            game_over,
+            winner_code,
+            blue_score,
+            red_score,
+        ) = STATE_HEADER.unpack_from(data)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError("Invalid game state data")
+        board_backend = SOSGame.BOARD_BACKENDS[backend_code]
+        payload = memoryview(data)[STATE_HEADER.size :]
+        if board_backend == SOSGame.SPARSE_BOARD:
+            if len(payload) % SPARSE_CELL.size:
+                raise ValueError("Invalid game state data: wrong board length")
+            cells = SPARSE_CELL.iter_unpack(payload)
+        else:
+            if len(payload) != board_size * board_size:
+                raise ValueError("Invalid game state data: wrong board length")
+            cells = enumerate(payload)
+        game_class = GAME_CLASSES[mode_code]
+        game = object.__new__(game_class)
+        SOSGame.__init__(game, board_size, board_backend=board_backend)
+        for index, code in cells:
+            if code != EMPTY_CODE:
+                game._load_cell(index, code)
+        if side:
+            game._switch_player()
+        game._blue_score = blue_score
+        game._red_score = red_score
+        game._game_over = bool(game_over)
+        game._winner = (None, SOSGame.BLUE, SOSGame.RED)[winner_code]
+        return game
+
+    # Pickle through to_bytes so positions are cheap to send to worker
+    # processes.
+    def __reduce__(self):
+        return (SOSGame.from_bytes, (self.to_bytes(),))
+
 
 # Simple game mode: first SOS wins.
 class SimpleGame(SOSGame):
-    def __init__(self, board_size=8, blue_player=None, red_player=None):
-        super().__init__(board_size, blue_player, red_player)
+    __slots__ = ()
+    _ZOBRIST_MODE_KEY = ZOBRIST_SIMPLE_KEY
+    _MODE_CODE = 1
+
+    def __init__(
+        self,
+        board_size=8,
+        blue_player=None,
+        red_player=None,
+        board_backend=SOSGame.LIST_BOARD,
+    ):
+        super().__init__(board_size, blue_player, red_player, board_backend)
 
     @property
     def game_mode(self):
@@ -194,16 +898,14 @@ class SimpleGame(SOSGame):
 
     # Override make_move for simple game logic.
     def make_move(self, row, col, letter):
-        if self._game_over:
-            return False
-        if not self._is_valid_move(row, col, letter):
+        if self._game_over or not self._is_valid_move(row, col, letter):
             return False
 
         # Remember current player before switch
         player_before_move = self._current_player
 
         # Place the letter
-        self._board[row][col] = letter
+        self._place(row, col, letter)
 
         self._move_history.append(
             {"row": row, "col": col, "letter": letter, "player": player_before_move}
@@ -234,8 +936,18 @@ class SimpleGame(SOSGame):
 
 # General game mode: most SOSs wins.
 class GeneralGame(SOSGame):
-    def __init__(self, board_size=8, blue_player=None, red_player=None):
-        super().__init__(board_size, blue_player, red_player)
+    __slots__ = ()
+    _ZOBRIST_MODE_KEY = ZOBRIST_GENERAL_KEY
+    _MODE_CODE = 2
+
+    def __init__(
+        self,
+        board_size=8,
+        blue_player=None,
+        red_player=None,
+        board_backend=SOSGame.LIST_BOARD,
+    ):
+        super().__init__(board_size, blue_player, red_player, board_backend)
 
     @property
     def game_mode(self):
@@ -243,16 +955,14 @@ class GeneralGame(SOSGame):
 
     # Override make_move for general game logic.
     def make_move(self, row, col, letter):
-        if self._game_over:
-            return False
-        if not self._is_valid_move(row, col, letter):
+        if self._game_over or not self._is_valid_move(row, col, letter):
             return False
 
         # Remember current player before potential switch
         player_before_move = self._current_player
 
         # Place the letter
-        self._board[row][col] = letter
+        self._place(row, col, letter)
 
         self._move_history.append(
             {"row": row, "col": col, "letter": letter, "player": player_before_move}
@@ -285,3 +995,11 @@ class GeneralGame(SOSGame):
                 self._winner = None
 
         return True
+
+
+# Game classes by the mode code stored in to_bytes().
+GAME_CLASSES = {
+    SOSGame._MODE_CODE: SOSGame,
+    SimpleGame._MODE_CODE: SimpleGame,
+    GeneralGame._MODE_CODE: GeneralGame,
+}
@@ -0,0 +1,206 @@
+# Vectorized engine that plays many SOS games at once with NumPy.
+import numpy as np
+from SOSGame import SOSGame, EMPTY_CODE, S_CODE, O_CODE
+
+# Margin of empty cells kept around each board so line probes never need
+# bounds checks.
+PADDING = 2
+
+DIRECTION_ROWS = np.array([dr for dr, _ in SOSGame.DIRECTIONS], dtype=np.intp)
+DIRECTION_COLS = np.array([dc for _, dc in SOSGame.DIRECTIONS], dtype=np.intp)
+
+
+# Batch of SOS games of one size and mode, stepped together.
+# Boards use the same cell codes as SOSGame; players are 0 (blue) and
+# 1 (red), and winners are -1 for a draw or an unfinished game.
+class BatchSOSGame:
+    BLUE = 0
+    RED = 1
+    NO_WINNER = -1
+
+    def __init__(self, game_count, board_size=8, game_mode=SOSGame.SIMPLE):
+        if board_size < 3:
+            raise ValueError("Board size must be at least 3")
+        if game_mode not in (SOSGame.SIMPLE, SOSGame.GENERAL):
+            raise ValueError(f"Unknown game mode: {game_mode}")
+        if game_count < 1:
+            raise ValueError("Game count must be at least 1")
+        self._game_count = game_count
+        self._board_size = board_size
+        self._game_mode = game_mode
+        self.reset()
+
+    @property
+    def game_count(self):
+        return self._game_count
+
+    @property
+    def board_size(self):
+        return self._board_size
+
+    @property
+    def game_mode(self):
+        return self._game_mode
+
+    # Boards as a (games, size, size) int8 view.
+    @property
+    def boards(self):
+        end = PADDING + self._board_size
+        return self._padded[:, PADDING:end, PADDING:end]
+
+    @property
+    def current_players(self):
+        return self._current_players
+
+    @property
+    def blue_scores(self):
+        return self._scores[:, self.BLUE]
+
+    @property
+    def red_scores(self):
+        return self._scores[:, self.RED]
+
+    @property
+    def game_over(self):
+        return self._game_over
+
+    @property
+    def winners(self):
+        return self._winners
+
+    @property
+    def empty_counts(self):
+        return self._empty_counts
+
+    @property
+    def all_over(self):
+        return bool(self._game_over.all())
+
+    # Clear every board and start all games over with blue to move.
+    def reset(self):
+        count = self._game_count
+        padded_size = self._board_size + 2 * PADDING
+        self._padded = np.zeros((count, padded_size, padded_size), dtype=np.int8)
+        self._current_players = np.zeros(count, dtype=np.int8)
+        self._scores = np.zeros((count, 2), dtype=np.int32)
+        self._game_over = np.zeros(count, dtype=bool)
+        self._winners = np.full(count, self.NO_WINNER, dtype=np.int8)
+        self._empty_counts = np.full(
+            count, self._board_size * self._board_size, dtype=np.int32
+        )
+
+    # Count the SOS each game would form by placing letter codes at the
+    # given padded coordinates, probing all 8 directions at once.
+    def _count_sos(self, games, rows, cols, codes):
+        padded = self._padded
+        games = games[:, None]
+        rows = rows[:, None]
+        cols = cols[:, None]
+        ahead = padded[games, rows + DIRECTION_ROWS, cols + DIRECTION_COLS]
+        beyond = padded[games, rows + 2 * DIRECTION_ROWS, cols + 2 * DIRECTION_COLS]
+        behind = padded[games, rows - DIRECTION_ROWS, cols - DIRECTION_COLS]
+        from_s = ((ahead == O_CODE) & (beyond == S_CODE)).sum(axis=1)
+        around_o = ((behind == S_CODE) & (ahead == S_CODE)).sum(axis=1)
+        return np.where(codes == S_CODE, from_s, around_o)
+
+    # Apply one move per game. Rows, columns and letter codes are arrays
+    # with one entry per game. Finished games and invalid moves are skipped.
+    # Returns a boolean mask of the games where a move was made.
+    def make_moves(self, rows, cols, codes):
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        codes = np.asarray(codes, dtype=np.int8)
+        size = self._board_size
+
+        in_bounds = (rows >= 0) & (rows < size) & (cols >= 0) & (cols < size)
+        letter_ok = (codes == S_CODE) | (codes == O_CODE)
+        applied = ~self._game_over & in_bounds & letter_ok
+        games = np.flatnonzero(applied)
+        padded_rows = rows[games] + PADDING
+        padded_cols = cols[games] + PADDING
+        empty = self._padded[games, padded_rows, padded_cols] == EMPTY_CODE
+        games = games[empty]
+        applied[:] = False
+        applied[games] = True
+        if games.size == 0:
+            return applied
+        padded_rows = padded_rows[empty]
+        padded_cols = padded_cols[empty]
+        codes = codes[games]
+
+        self._padded[games, padded_rows, padded_cols] = codes
+        self._empty_counts[games] -= 1
+        counts = self._count_sos(games, padded_rows, padded_cols, codes)
+        players = self._current_players[games]
+        self._scores[games, players] += counts
+
+        scored = counts > 0
+        full = self._empty_counts[games] == 0
+        if self._game_mode == SOSGame.SIMPLE:
+            # First SOS wins; a full board without one is a draw.
+            finished = scored | full
+            self._winners[games[scored]] = players[scored]
+            switch = ~finished
+        else:
+            # Scoring keeps the turn; the higher score wins once full.
+            finished = full
+            switch = ~scored
+            done = games[full]
+            blue = self._scores[done, self.BLUE]
+            red = self._scores[done, self.RED]
+            self._winners[done] = np.where(
+                blue > red, self.BLUE, np.where(red > blue, self.RED, self.NO_WINNER)
+            )
+        self._game_over[games[finished]] = True
+        self._current_players[games[switch]] ^= 1
+        return applied
+
+    # Pick a uniformly random empty cell and letter for every game.
+    # Finished games get a move too; make_moves ignores it.
+    def random_moves(self, rng):
+        size = self._board_size
+        keys = rng.random((self._game_count, size * size))
+        keys[self.boards.reshape(self._game_count, -1) != EMPTY_CODE] = -1.0
+        cells = keys.argmax(axis=1)
+        codes = rng.integers(S_CODE, O_CODE + 1, size=self._game_count, dtype=np.int8)
+        return cells // size, cells % size, codes
+
+    # Play every unfinished game to the end with uniformly random moves.
+    # Each game walks its own random permutation of the cells, skipping
+    # occupied ones, which picks uniformly among the empty cells without
+    # drawing fresh random keys for the whole board every step.
+    def play_random(self, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        count = self._game_count
+        size = self._board_size
+        cell_count = size * size
+        order = rng.permuted(np.tile(np.arange(cell_count), (count, 1)), axis=1)
+        positions = np.zeros(count, dtype=np.intp)
+        rows = np.full(count, -1, dtype=np.intp)
+        cols = np.full(count, -1, dtype=np.intp)
+        codes = np.zeros(count, dtype=np.int8)
+        while True:
+            active = np.flatnonzero(~self._game_over)
+            if active.size == 0:
+                break
+            while True:
+                cells = order[active, positions[active]]
+                cell_rows = cells // size
+                cell_cols = cells % size
+                taken = (
+                    self._padded[active, cell_rows + PADDING, cell_cols + PADDING]
+                    != EMPTY_CODE
+                )
+                if not taken.any():
+                    break
+                positions[active[taken]] += 1
+            positions[active] += 1
+            rows.fill(-1)
+            rows[active] = cell_rows
+            cols[active] = cell_cols
+            codes[active] = rng.integers(
+                S_CODE, O_CODE + 1, size=active.size, dtype=np.int8
+            )
+            self.make_moves(rows, cols, codes)
+        return self._winners
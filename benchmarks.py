@@ -0,0 +1,374 @@
+# Engine benchmark suite. Prints results as JSON and compares them with a
+# stored baseline, exiting with status 1 if anything regressed.
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from SOSGame import SOSGame, SimpleGame, GeneralGame
+from game_replayer import GameReplayer
+from player import ComputerPlayer, HeuristicPlayer, SearchPlayer
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json"
+)
+
+# Allowed slowdown against the baseline before a metric counts as a
+# regression, as a fraction. Shared machines vary by a third between runs
+# even after calibration; lower it on a quiet machine.
+DEFAULT_TOLERANCE = 0.5
+
+# Latencies this close to the baseline, in seconds, are never regressions;
+# a few microseconds is within timer and cache noise.
+LATENCY_NOISE_FLOOR = 1e-5
+
+# Shortest timed batch in seconds, for full and quick runs.
+MIN_TIME = 0.1
+QUICK_MIN_TIME = 0.02
+
+# Benchmarks timed with full batches even in quick runs. A decision takes
+# up to a millisecond, so quick batches of it are too short to compare with
+# the baseline.
+FULL_BATCH_BENCHMARKS = ("decision_latency",)
+
+GAME_CLASSES = {SOSGame.SIMPLE: SimpleGame, SOSGame.GENERAL: GeneralGame}
+LATENCY_SIZES = (3, 5, 8, 20, 50, 100)
+
+
+# A measured value, its unit, whether higher or lower is better and whether
+# it depends on machine speed.
+def _metric(value, unit, higher_is_better, timed=True):
+    return {
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "timed": timed,
+    }
+
+
+# Time one call of run(). Calls are looped until a batch takes at least
+# min_time, then the batch is repeated and the fastest one kept, which is
+# the least disturbed by other load on the machine.
+def _time_per_call(run, repeat, min_time):
+    loops = 1
+    while True:
+        elapsed = _time_loops(run, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time_loops(run, loops))
+    return best / loops
+
+
+def _time_loops(run, loops):
+    gc.collect()
+    started = time.perf_counter()
+    for _ in range(loops):
+        run()
+    return time.perf_counter() - started
+
+
+# Fill a game with seeded random moves until the given fraction of cells
+# is taken or the game ends.
+def _random_position(game_class, board_size, fill, seed=1, **kwargs):
+    rng = random.Random(seed)
+    game = game_class(board_size=board_size, **kwargs)
+    target = int(board_size * board_size * (1 - fill))
+    while game.empty_count > target and not game.game_over:
+        row, col = game.random_empty_cell(rng)
+        game.make_move(row, col, rng.choice("SO"))
+    return game
+
+
+# Speed of a fixed pure Python workload, used to scale timed results when
+# comparing runs from different machines or under different load.
+def bench_calibration(min_time, repeat):
+    def run():
+        total = 0
+        cells = {}
+        for i in range(1000):
+            cells[i] = i & 3
+            total += cells[i // 2]
+        return total
+
+    seconds = _time_per_call(run, repeat, min_time)
+    return {"calibration": _metric(1.0 / seconds, "loops/s", True)}
+
+
+# Moves per second for whole games of seeded random moves, per mode, size
+# and board backend.
+def bench_random_games(min_time, repeat):
+    results = {}
+    for mode, game_class in GAME_CLASSES.items():
+        for board_size in (3, 8, 20, 50):
+            # The same seeded games every run, so each run makes the same
+            # number of moves.
+            rng = random.Random(1)
+            games = []
+            for _ in range(max(1, 400 // (board_size * board_size))):
+                cells = [
+                    (row, col, rng.choice("SO"))
+                    for row in range(board_size)
+                    for col in range(board_size)
+                ]
+                rng.shuffle(cells)
+                games.append(cells)
+            for backend in SOSGame.BOARD_BACKENDS:
+                counter = [0]
+
+                def run():
+                    moves = 0
+                    for cells in games:
+                        game = game_class(board_size=board_size, board_backend=backend)
+                        for row, col, letter in cells:
+                            if game.game_over:
+                                break
+                            game.make_move(row, col, letter)
+                            moves += 1
+                    counter[0] = moves
+
+                seconds = _time_per_call(run, repeat, min_time)
+                name = f"random_games.{mode.lower()}.{board_size}.{backend}"
+                results[name] = _metric(counter[0] / seconds, "moves/s", True)
+    return results
+
+
+# SOS detection calls per second on a half-filled board, probing every
+# empty cell with both letters.
+def bench_detect_sos(min_time, repeat):
+    results = {}
+    for board_size in (8, 20, 100):
+        game = _random_position(GeneralGame, board_size, 0.5)
+        probes = [
+            (row, col, letter) for row, col in game.legal_moves() for letter in "SO"
+        ]
+
+        def run():
+            detect = game._detect_sos
+            for row, col, letter in probes:
+                detect(row, col, letter)
+
+        seconds = _time_per_call(run, repeat, min_time)
+        results[f"detect_sos.{board_size}"] = _metric(
+            len(probes) / seconds, "calls/s", True
+        )
+    return results
+
+
+# Seconds per get_move() for each player on part-filled General boards.
+# Search is only timed on small boards, with a fixed depth so the result
+# measures speed rather than the time limit.
+def bench_decision_latency(min_time, repeat):
+    players = {
+        "computer": (ComputerPlayer, LATENCY_SIZES),
+        "heuristic": (HeuristicPlayer, LATENCY_SIZES),
+        "search": (
+            lambda color: SearchPlayer(color, time_limit=60.0, max_depth=2),
+            (3, 5, 8),
+        ),
+    }
+    results = {}
+    for name, (make_player, sizes) in players.items():
+        for board_size in sizes:
+            # Average over positions from a tenth to nine tenths full, each
+            # with its own player so per-game state stays warm.
+            positions = []
+            for seed in range(1, 10):
+                game = _random_position(GeneralGame, board_size, seed / 10, seed)
+                if not game.game_over:
+                    positions.append((make_player(game.current_player), game))
+
+            def run():
+                for player, game in positions:
+                    player.get_move(game)
+
+            random.seed(1)
+            seconds = _time_per_call(run, repeat, min_time)
+            results[f"decision_latency.{name}.{board_size}"] = _metric(
+                seconds / len(positions), "s", False
+            )
+    return results
+
+
+# Moves per second replaying recordings through GameReplayer, including
+# loading the files.
+def bench_replay(min_time, repeat):
+    game_count = 20
+    board_size = 8
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        rng = random.Random(1)
+        for i in range(game_count):
+            game = GeneralGame(board_size=board_size)
+            while not game.game_over:
+                row, col = game.random_empty_cell(rng)
+                game.make_move(row, col, rng.choice("SO"))
+            path = os.path.join(directory, f"game_{i}.json")
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "board_size": board_size,
+                        "game_mode": SOSGame.GENERAL,
+                        "blue_player_type": "Computer",
+                        "red_player_type": "Computer",
+                        "moves": game.move_history,
+                        "final_state": {
+                            "winner": game.winner,
+                            "blue_score": game.blue_score,
+                            "red_score": game.red_score,
+                        },
+                    },
+                    f,
+                )
+            paths.append(path)
+        counter = [0]
+
+        def run():
+            moves = 0
+            replayer = GameReplayer()
+            for path in paths:
+                replayer.load_game(path)
+                config = replayer.get_game_config()
+                game = GAME_CLASSES[config["game_mode"]](config["board_size"])
+                move = replayer.get_next_move()
+                while move is not None:
+                    game.make_move(move["row"], move["col"], move["letter"])
+                    moves += 1
+                    move = replayer.get_next_move()
+            counter[0] = moves
+
+        seconds = _time_per_call(run, repeat, min_time)
+    results["replay.moves_per_second"] = _metric(counter[0] / seconds, "moves/s", True)
+    results["replay.games_per_second"] = _metric(game_count / seconds, "games/s", True)
+    return results
+
+
+# Bytes allocated per game, new and half-filled, per size and backend.
+def bench_memory(min_time, repeat):
+    results = {}
+    for board_size in (8, 20, 100):
+        for backend in SOSGame.BOARD_BACKENDS:
+            for fill in (0.0, 0.5):
+                # Build one game first so shared per-size tables are not
+                # counted against the measured one.
+                _random_position(GeneralGame, board_size, fill, board_backend=backend)
+                gc.collect()
+                tracemalloc.start()
+                game = _random_position(
+                    GeneralGame, board_size, fill, board_backend=backend
+                )
+                size, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del game
+                name = f"memory.{board_size}.{backend}.{int(fill * 100)}pct"
+                results[name] = _metric(size, "bytes", False, timed=False)
+    return results
+
+
+BENCHMARKS = {
+    "calibration": bench_calibration,
+    "random_games": bench_random_games,
+    "detect_sos": bench_detect_sos,
+    "decision_latency": bench_decision_latency,
+    "replay": bench_replay,
+    "memory": bench_memory,
+}
+
+
+# Run the selected benchmarks, always with calibration, and return
+# {metric name: metric}. Quick runs time shorter batches, except for
+# FULL_BATCH_BENCHMARKS, so they are noisier but measure the same things.
+def run_benchmarks(names=None, quick=False, repeat=5):
+    names = list(names or BENCHMARKS)
+    if "calibration" not in names:
+        names.insert(0, "calibration")
+    results = {}
+    for name in names:
+        quick_batches = quick and name not in FULL_BATCH_BENCHMARKS
+        min_time = QUICK_MIN_TIME if quick_batches else MIN_TIME
+        results.update(BENCHMARKS[name](min_time, repeat))
+    return results
+
+
+# Compare results with a baseline and return a list of regression messages
+# for metrics that got worse by more than the tolerance. Timed baseline
+# values are scaled by the calibration speed ratio when both runs have one.
+# Metrics missing from either side are skipped.
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    speed = 1.0
+    if "calibration" in results and "calibration" in baseline:
+        speed = results["calibration"]["value"] / baseline["calibration"]["value"]
+    regressions = []
+    for name, metric in sorted(results.items()):
+        if name not in baseline or name == "calibration":
+            continue
+        old = baseline[name]["value"]
+        new = metric["value"]
+        if not old:
+            continue
+        if metric["timed"]:
+            old = old * speed if metric["higher_is_better"] else old / speed
+        if metric["unit"] == "s" and new - old < LATENCY_NOISE_FLOOR:
+            continue
+        if metric["higher_is_better"]:
+            change = (old - new) / old
+        else:
+            change = (new - old) / old
+        if change > tolerance:
+            regressions.append(
+                f"{name}: {new:.4g} {metric['unit']} vs baseline "
+                f"{old:.4g} ({change:.0%} worse)"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SOS engine.")
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--quick", action="store_true", help="shorter timing batches")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the new baseline",
+    )
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.benchmarks, args.quick, args.repeat)
+    report = json.dumps(results, indent=2, sort_keys=True)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(report + "\n")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Vectorized whole-board evaluation with NumPy. Every feature is computed
+# for all cells at once by comparing the board with copies of itself
+# shifted along the four line orientations.
+import numpy as np
+from SOSGame import SOSGame, EMPTY_CODE, S_CODE, O_CODE, STATE_HEADER, SPARSE_CELL
+
+# Code for the margin around each board. It matches no letter and is not
+# empty, so lines running off the board never count.
+WALL_CODE = 3
+PADDING = 2
+
+# One direction per line orientation; features add up both senses.
+ORIENTATIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+# Get a game's board as a (size, size) int8 array of cell codes.
+def board_array(game):
+    size = game.board_size
+    data = game.to_bytes()[STATE_HEADER.size :]
+    if game.board_backend == SOSGame.SPARSE_BOARD:
+        board = np.zeros(size * size, dtype=np.int8)
+        for index, code in SPARSE_CELL.iter_unpack(data):
+            board[index] = code
+    else:
+        board = np.frombuffer(data, dtype=np.int8).copy()
+    return board.reshape(size, size)
+
+
+# Stack the boards of several games of one size into a (games, size, size)
+# array.
+def boards_array(games):
+    return np.stack([board_array(game) for game in games])
+
+
+# Evaluate one board of shape (size, size) or a batch of shape
+# (games, size, size), given as cell codes, e.g. from board_array() or
+# BatchSOSGame.boards. Returns a dict of arrays shaped like the input:
+#   s_threats, o_threats: SOS an S or an O at each empty cell would score,
+#     counted as SOSGame counts them, so an O completing an SOS scores it
+#     once from each end.
+#   s_gifts, o_gifts: SOS the opponent could then score at once after an S
+#     or an O at each empty cell, as PoisonedCells counts them.
+# and one value per board (a scalar for a single board):
+#   sos: completed SOS on the board.
+#   threats, poisoned: scoring and poisoned moves, counting each letter at
+#     each cell as one move.
+def evaluate(boards):
+    boards = np.asarray(boards, dtype=np.int8)
+    single = boards.ndim == 2
+    if single:
+        boards = boards[None]
+    count, size, _ = boards.shape
+    # Boards are laid out one after another, each with its margin, and
+    # flattened, so a step along a line is a fixed offset into one array
+    # for every board at once. Margins keep steps of up to two cells from
+    # reaching another board.
+    width = size + 2 * PADDING
+    padded = np.full((count, width, width), WALL_CODE, dtype=np.int8)
+    padded[:, PADDING:-PADDING, PADDING:-PADDING] = boards
+    padded = padded.reshape(-1)
+    # Masks as 0/1 bytes, so they add up without conversions.
+    is_s = (padded == S_CODE).view(np.uint8)
+    is_o = (padded == O_CODE).view(np.uint8)
+    is_empty = (padded == EMPTY_CODE).view(np.uint8)
+    margin = PADDING * (width + 1)
+    end = padded.size - margin
+
+    # View of a mask holding, at each cell, the value at offset from it.
+    def shifted(mask, offset):
+        return mask[margin + offset : end + offset]
+
+    # Features are kept for the whole padded layout and read through views
+    # of the part that is computed, so the boards come out as plain views.
+    totals = np.zeros((6, padded.size), dtype=np.uint8)
+    s_threats, o_threats, s_gifts, s_double_gifts, o_gifts, sos_cells = (
+        shifted(total, 0) for total in totals
+    )
+    here_o = shifted(is_o, 0)
+    for dr, dc in ORIENTATIONS:
+        step = dr * width + dc
+        before_s = shifted(is_s, -step)
+        after_s = shifted(is_s, step)
+        both_s = before_s & after_s
+        sos_cells += both_s & here_o
+        o_threats += both_s
+        o_gifts += (before_s & shifted(is_empty, step)) | (
+            shifted(is_empty, -step) & after_s
+        )
+        for offset in (step, -step):
+            middle_o = shifted(is_o, offset)
+            end_s = shifted(is_s, 2 * offset)
+            s_threats += middle_o & end_s
+            s_gifts += middle_o & shifted(is_empty, 2 * offset)
+            s_double_gifts += shifted(is_empty, offset) & end_s
+    # An O between two S scores the line from both ends, and an S whose
+    # middle cell is empty gifts the opponent that double O.
+    o_threats <<= 1
+    s_double_gifts <<= 1
+    s_gifts += s_double_gifts
+
+    here_empty = shifted(is_empty, 0)
+    for values in (s_threats, o_threats, s_gifts, o_gifts):
+        values *= here_empty
+    cells = totals.reshape(6, count, width, width)[
+        :, :, PADDING:-PADDING, PADDING:-PADDING
+    ]
+    features = {
+        "s_threats": cells[0],
+        "o_threats": cells[1],
+        "s_gifts": cells[2],
+        "o_gifts": cells[4],
+        "sos": totals[5].reshape(count, -1).sum(axis=1, dtype=np.int64),
+    }
+    features["threats"] = np.count_nonzero(cells[0], axis=(1, 2)) + np.count_nonzero(
+        cells[1], axis=(1, 2)
+    )
+    features["poisoned"] = np.count_nonzero(cells[2], axis=(1, 2)) + np.count_nonzero(
+        cells[4], axis=(1, 2)
+    )
+    if single:
+        features = {name: values[0] for name, values in features.items()}
+    return features
+
+
+# Evaluate a game's current position, see evaluate().
+def evaluate_game(game):
+    return evaluate(board_array(game))
@@ -2,6 +2,7 @@
 
 import json
 import os
+from SOSGame import SOSGame, SimpleGame, GeneralGame
 
 
 # Handles loading and replaying recorded games
@@ -84,3 +85,20 @@ class GameReplayer:
         if self._game_data is None:
             return None
         return self._game_data["final_state"]
+
+    # Replay all moves on a fresh game and get the position hash after each.
+    # Canonical hashes fold rotated and mirrored positions together.
+    def get_position_hashes(self, canonical=False):
+        if self._game_data is None:
+            return []
+
+        if self._game_data["game_mode"] == SOSGame.SIMPLE:
+            game = SimpleGame(self._game_data["board_size"])
+        else:
+            game = GeneralGame(self._game_data["board_size"])
+
+        hashes = []
+        for move in self._game_data["moves"]:
+            game.make_move(move["row"], move["col"], move["letter"])
+            hashes.append(game.canonical_hash if canonical else game.position_hash)
+        return hashes
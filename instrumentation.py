@@ -0,0 +1,235 @@
+# Opt-in instrumentation for the engine, players and recorder. Nothing is
+# measured until enable() is called: it swaps timed wrappers in for the
+# instrumented methods and disable() puts the originals back, so disabled
+# code runs exactly as before.
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from SOSGame import SOSGame, SimpleGame, GeneralGame
+from player import Player
+from game_recorder import GameRecorder
+
+# Latency histograms have one bucket per power of two nanoseconds.
+HISTOGRAM_BUCKETS = 64
+
+_counters = {}
+_timings = {}
+_patched = []
+_lock = threading.Lock()
+
+
+# Call count, total, extremes and a log2 histogram of durations in ns.
+class _Timing:
+    __slots__ = ("calls", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if self.min is None or elapsed < self.min:
+            self.min = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[min(elapsed.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def snapshot(self):
+        # Bucket k holds durations below 2**k ns.
+        histogram = {
+            f"<{1 << bucket}ns": count
+            for bucket, count in enumerate(self.buckets)
+            if count
+        }
+        return {
+            "calls": self.calls,
+            "total_seconds": self.total / 1e9,
+            "mean_seconds": self.total / self.calls / 1e9 if self.calls else 0.0,
+            "min_seconds": (self.min or 0) / 1e9,
+            "max_seconds": self.max / 1e9,
+            "histogram": histogram,
+        }
+
+
+def _count(name, amount=1):
+    _counters[name] = _counters.get(name, 0) + amount
+
+
+# Counter updates per instrumented method, from the method's result.
+def _count_moves(made):
+    if made:
+        _count("moves")
+
+
+def _count_detections(sequences):
+    _count("detections")
+    _count("sos_found", len(sequences))
+
+
+def _count_probes(found):
+    _count("probes")
+
+
+def _count_decisions(move):
+    _count("decisions")
+
+
+# Engine methods to time, with their counter updates.
+ENGINE_METHODS = {
+    "make_move": _count_moves,
+    "unmake_move": None,
+    "_detect_sos": _count_detections,
+    "_count_sos": _count_probes,
+    "_sync_threats": None,
+    "_is_board_full": None,
+    "scoring_moves": None,
+}
+RECORDER_METHODS = ("record_move", "save_recording")
+
+
+# Replace cls.name with a wrapper timing each call under site.
+def _wrap(cls, name, site, on_result=None):
+    original = cls.__dict__[name]
+    timing = _timings.setdefault(site, _Timing())
+    clock = time.perf_counter_ns
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        started = clock()
+        try:
+            result = original(*args, **kwargs)
+        finally:
+            timing.add(clock() - started)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    setattr(cls, name, wrapper)
+    _patched.append((cls, name, original))
+
+
+def _player_classes(cls=Player):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _player_classes(subclass)
+
+
+def is_enabled():
+    return bool(_patched)
+
+
+# Start instrumenting the engine, every Player subclass defined so far and
+# the game recorder. Does nothing if already enabled.
+def enable():
+    with _lock:
+        if _patched:
+            return
+        for cls in (SOSGame, SimpleGame, GeneralGame):
+            for name, on_result in ENGINE_METHODS.items():
+                if name in cls.__dict__:
+                    _wrap(cls, name, f"{cls.__name__}.{name}", on_result)
+        for cls in set(_player_classes()):
+            if "get_move" in cls.__dict__:
+                _wrap(cls, "get_move", f"{cls.__name__}.get_move", _count_decisions)
+        for name in RECORDER_METHODS:
+            _wrap(GameRecorder, name, f"GameRecorder.{name}")
+
+
+# Restore the original methods. Collected data is kept until reset().
+def disable():
+    with _lock:
+        while _patched:
+            cls, name, original = _patched.pop()
+            setattr(cls, name, original)
+
+
+def reset():
+    _counters.clear()
+    _timings.clear()
+
+
+# Get the counters and per call site timings collected so far.
+def snapshot():
+    return {
+        "counters": dict(_counters),
+        "timings": {
+            site: timing.snapshot()
+            for site, timing in sorted(_timings.items())
+            if timing.calls
+        },
+    }
+
+
+# Instrument the code inside a with block, restoring the previous state on
+# exit.
+@contextmanager
+def instrumented():
+    was_enabled = is_enabled()
+    enable()
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable()
+
+
+# Call func once under cProfile and tracemalloc and return (result, report).
+# The report holds the top functions by cumulative time as text and the
+# current and peak traced memory with the top allocating lines.
+def capture(func, *args, profile=True, memory=True, top=20, **kwargs):
+    report = {}
+    profiler = cProfile.Profile() if profile else None
+    if memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if memory:
+            allocations = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    if profiler is not None:
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(top)
+        report["profile"] = stream.getvalue()
+    if memory:
+        report["memory"] = {
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [str(stat) for stat in allocations.statistics("lineno")[:top]],
+        }
+    return result, report
+
+
+# Play one game between two players with instrumentation on, under
+# capture(). Returns (game, report), where the report also holds the
+# instrumentation snapshot for the game.
+def capture_game(game, blue_player, red_player, **options):
+    players = {SOSGame.BLUE: blue_player, SOSGame.RED: red_player}
+
+    def play():
+        while not game.game_over:
+            move = players[game.current_player].get_move(game)
+            if move is None or not game.make_move(*move):
+                break
+        return game
+
+    reset()
+    with instrumented():
+        result, report = capture(play, **options)
+    report["instrumentation"] = snapshot()
+    return result, report
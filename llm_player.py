@@ -1,49 +1,261 @@
 # LLM-powered opponent using local LM Studio server
-import requests
+import asyncio
+import json
+import os
 import re
-from player import Player
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from player import Player, HeuristicPlayer
+from SOSGame import SOSGame, SYMMETRY_INVERSES, transform_cell
+
+# Keep-alive connections kept open per host by the shared sessions.
+DEFAULT_POOL_SIZE = 8
+
+# Seconds an LLM player may spend on a move before the local engine moves
+# instead.
+DEFAULT_MOVE_BUDGET = 30.0
+
+# A move in a reply, like "2,3,S" or "2, 3, s".
+MOVE_PATTERN = re.compile(r"(\d+)\s*,\s*(\d+)\s*,\s*([SOso])")
+
+# Bytes read at a time from a streamed reply. Reads block until this many
+# arrive, so it is kept small for servers that send events unframed.
+STREAM_CHUNK_SIZE = 1
+
+# Positions kept in memory by a move cache.
+DEFAULT_CACHE_SIZE = 4096
+
+_sessions = {}
+_caches = {}
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+
+# Drop shared sessions and caches inherited from a parent process. Call
+# with _shared_lock held.
+def _check_process():
+    global _shared_pid
+    if _shared_pid != os.getpid():
+        _sessions.clear()
+        _caches.clear()
+        _shared_pid = os.getpid()
+
+
+# Get the process-wide HTTP session for a pool size, creating it on first
+# use. Requests reuse its keep-alive connections instead of connecting each
+# time, and at most pool_size connections per host are open at once; more
+# concurrent requests wait for a free one. Worker processes get their own
+# sessions rather than sharing sockets inherited from their parent.
+def shared_session(pool_size=DEFAULT_POOL_SIZE):
+    with _shared_lock:
+        _check_process()
+        session = _sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[pool_size] = session
+        return session
+
+
+# Close every shared session in this process.
+def close_sessions():
+    with _shared_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# Get the process-wide move cache, in memory only or backed by the SQLite
+# file at path, creating it on first use.
+def shared_cache(path=None):
+    with _shared_lock:
+        _check_process()
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = MoveCache(path=path)
+        return cache
+
+
+# Cache of validated LLM moves keyed by position, side, game mode and
+# model id. Positions are keyed by their canonical board, so a move found for
+# one board is reused on its rotations and reflections. The most recently
+# used entries are kept in memory; with a path, every entry is also stored
+# in a SQLite file and read back on a memory miss. Entries stored under a
+# generic model name outlive a model swap on the server, so clear() a
+# persistent cache filled that way before playing with another model.
+class MoveCache:
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE, path=None):
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS moves "
+                "(key BLOB PRIMARY KEY, row INTEGER, col INTEGER, letter TEXT)"
+            )
+            self._db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Hit and miss counts. Hits include those read from disk.
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+    # Get (key, symmetry) for a position, where symmetry maps the game's
+    # cells onto the keyed canonical image. Sparse boards are too large to
+    # image, so their key uses the canonical hash instead of the board.
+    def _key(self, game, color, model):
+        if game.board_backend == SOSGame.SPARSE_BOARD:
+            board = game.canonical_hash.to_bytes(8, "little")
+            symmetry = game.canonical_symmetry
+        else:
+            board, symmetry = game.canonical_form()
+        suffix = f"|{game.board_size}|{color}|{game.game_mode}|{model}"
+        return board + suffix.encode(), symmetry
+
+    # Get the cached move for a position, or None.
+    def get(self, game, color, model):
+        key, symmetry = self._key(game, color, model)
+        with self._lock:
+            move = self._entries.get(key)
+            if move is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT row, col, letter FROM moves WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    move = tuple(row)
+                    self._remember(key, move)
+                    self.hits += 1
+                    self.disk_hits += 1
+            if move is None:
+                self.misses += 1
+                return None
+        row, col, letter = move
+        inverse = SYMMETRY_INVERSES[symmetry]
+        row, col = transform_cell(row, col, game.board_size, inverse)
+        return (row, col, letter)
+
+    # Store the move played in a position.
+    def put(self, game, color, model, move):
+        key, symmetry = self._key(game, color, model)
+        row, col, letter = move
+        row, col = transform_cell(row, col, game.board_size, symmetry)
+        with self._lock:
+            self._remember(key, (row, col, letter))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO moves VALUES (?, ?, ?, ?)",
+                    (key, row, col, letter),
+                )
+                self._db.commit()
+
+    def _remember(self, key, move):
+        self._entries[key] = move
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM moves")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
 
 
 class LLMPlayer(Player):
-    def __init__(self, color):
+    # cache is a MoveCache, a path for a persistent shared cache, True for
+    # the shared in-memory cache or False for none. A move takes at most
+    # about move_budget seconds; then the fallback player moves instead, a
+    # HeuristicPlayer by default, or with fallback=None the move fails.
+    # With stream, replies are read as server-sent events and the request
+    # is dropped as soon as they contain a valid move. model is the model
+    # to request; cached moves are keyed on the model id the server reports
+    # serving, so the cache is only read once a reply named it, unless a
+    # model is given.
+    def __init__(
+        self,
+        color,
+        pool_size=DEFAULT_POOL_SIZE,
+        cache=True,
+        move_budget=DEFAULT_MOVE_BUDGET,
+        fallback=True,
+        stream=True,
+        model=None,
+    ):
         super().__init__(color)
         # LM Studio local server URL
         self.api_url = "http://localhost:1234/v1/chat/completions"
-        self.model = "local-model"
+        self.model = model or "local-model"
+        self.model_id = model
+        self.session = shared_session(pool_size)
+        if cache is True:
+            cache = shared_cache()
+        elif cache is False:
+            cache = None
+        elif isinstance(cache, str):
+            cache = shared_cache(cache)
+        self.cache = cache
+        self.move_budget = move_budget
+        if fallback is True:
+            fallback = HeuristicPlayer(color)
+        self.fallback = fallback
+        self.stream = stream
 
     def get_move(self, game):
+        move = self._local_move(game)
+        if move is not None:
+            return move
+        deadline = time.monotonic() + self.move_budget
         max_retries = 5
         current_prompt = self._build_prompt(game)
 
         print(f"\n[LLM {self.color}] Thinking locally...")
 
         for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    self.api_url,
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are a master SOS player. Return ONLY the move: row,col,letter. No explanation.",
-                            },
-                            {"role": "user", "content": current_prompt},
-                        ],
-                        "temperature": 0.0,
-                        "max_tokens": 50,
-                    },
-                    timeout=30,
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._fallback_move(
+                    game, f"LLM used its {self.move_budget}s move budget."
                 )
-
-                if response.status_code != 200:
-                    print(f"[LLM {self.color}] Server Error: {response.text}")
+            try:
+                completion = self._complete(current_prompt, deadline, game)
+                if completion is None:
                     continue
-
-                content = response.json()["choices"][0]["message"]["content"].strip()
+                content, move = completion
                 print(f"[LLM {self.color}] Response (Attempt {attempt+1}): {content}")
 
-                move = self._parse_move(content, game)
+                if move is None:
+                    move = self._parse_move(content, game)
 
                 # VALIDATION
                 if move:
@@ -52,6 +264,7 @@ class LLMPlayer(Player):
                         print(
                             f"[LLM {self.color}] Playing: row={row}, col={col}, letter={letter}"
                         )
+                        self._store_move(game, move)
                         return move
                     else:
                         print(
@@ -66,10 +279,127 @@ class LLMPlayer(Player):
             except Exception as e:
                 print(f"[LLM {self.color}] Connection Error: {e}")
 
-        # Failed 11 times
-        raise RuntimeError(
-            f"LLM failed to make a valid move after {max_retries} attempts!"
+        return self._fallback_move(
+            game, f"LLM failed to make a valid move after {max_retries} attempts!"
+        )
+
+    # Ask the model once and return (content, move), where move is the
+    # first valid move a streamed reply contained, or None to parse the
+    # content as usual. Returns None if the server answers with an error.
+    def _complete(self, prompt, deadline, game):
+        response = self.session.post(
+            self.api_url,
+            json=self._request_body(prompt),
+            timeout=min(30, deadline - time.monotonic()),
+            stream=self.stream,
         )
+        with response:
+            if response.status_code != 200:
+                print(f"[LLM {self.color}] Server Error: {response.text}")
+                return None
+            if not self.stream:
+                return self._response_content(response.json()), None
+            content = ""
+            lines = response.iter_lines(STREAM_CHUNK_SIZE, decode_unicode=True)
+            for line in lines:
+                text = self._stream_text(line)
+                if text is None:
+                    break
+                content += text
+                move = self._first_valid_move(content, game)
+                if move is not None or time.monotonic() > deadline:
+                    # Closing the response drops the connection, which
+                    # stops the server generating the rest.
+                    return content.strip(), move
+            return content.strip(), None
+
+    # Get a move without asking the model: a forced move or a cached one.
+    def _local_move(self, game):
+        return self._forced_move(game) or self._cached_move(game)
+
+    # Get the move the engine says must be played, or None. Every open
+    # S-O-_ or S-_-S line scores for whichever side fills it, so the way to
+    # block the opponent's threat is to complete it; the move forming the
+    # most SOS covers both. The last empty cell is forced too.
+    def _forced_move(self, game):
+        move = game.best_scoring_move()
+        if move is None and game.empty_count == 1:
+            row, col = game.empty_cell(0)
+            move = (row, col, "S")
+        if move is not None:
+            row, col, letter = move
+            print(f"[LLM {self.color}] Forced: row={row}, col={col}, letter={letter}")
+        return move
+
+    # Let the fallback player move after the model failed, or raise
+    # RuntimeError with the message if there is none.
+    def _fallback_move(self, game, message):
+        if self.fallback is None:
+            raise RuntimeError(message)
+        print(f"[LLM {self.color}] {message} Playing a local engine move.")
+        return self.fallback.get_move(game)
+
+    # Get the cached move for the position if it is still legal, or None.
+    def _cached_move(self, game):
+        if self.cache is None or self.model_id is None:
+            return None
+        move = self.cache.get(game, self.color, self.model_id)
+        if move is not None and self._is_valid_move(move, game):
+            row, col, letter = move
+            print(f"[LLM {self.color}] Cached: row={row}, col={col}, letter={letter}")
+            return move
+        return None
+
+    def _store_move(self, game, move):
+        if self.cache is not None and self.model_id is not None:
+            self.cache.put(game, self.color, self.model_id, move)
+
+    # Chat completion request for a prompt.
+    def _request_body(self, prompt, temperature=0.0):
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a master SOS player. Return ONLY the move: row,col,letter. No explanation.",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": temperature,
+            "max_tokens": 50,
+            "stream": self.stream,
+        }
+
+    def _response_content(self, data):
+        self._note_model(data)
+        return data["choices"][0]["message"]["content"].strip()
+
+    # Remember the model id a reply says served it.
+    def _note_model(self, data):
+        model = data.get("model")
+        if isinstance(model, str) and model:
+            self.model_id = model
+
+    # Get the text one server-sent event line adds to a streamed reply, or
+    # None once the stream is done.
+    def _stream_text(self, line):
+        if not line or not line.startswith("data:"):
+            return ""
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        data = json.loads(data)
+        self._note_model(data)
+        choices = data.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+    # Get the first valid move in a partial reply, or None.
+    def _first_valid_move(self, text, game):
+        for match in MOVE_PATTERN.finditer(text):
+            move = (int(match.group(1)), int(match.group(2)), match.group(3).upper())
+            if self._is_valid_move(move, game):
+                return move
+        return None
 
     def _build_prompt(self, game):
         board_str = self._format_board(game)
@@ -110,7 +440,7 @@ Analyze every row, column, and diagonal. Your move:"""
     def _parse_move(self, response, game):
         # Parse LLM response into (row, col, letter) tuple
         # Extract pattern like "2,3,S" or "2, 3, S"
-        matches = list(re.finditer(r"(\d+)\s*,\s*(\d+)\s*,\s*([SOso])", response))
+        matches = list(MOVE_PATTERN.finditer(response))
         if matches:
             match = matches[-1]  # Take the last one found
             row = int(match.group(1))
@@ -134,3 +464,182 @@ Analyze every row, column, and diagonal. Your move:"""
             return False
 
         return True
+
+
+# Send a JSON body as a POST over a fresh asyncio connection and return
+# (reader, writer) to read the response from. Closing the writer, as
+# cancelling a task reading the response should, drops the connection,
+# which stops the server working on an abandoned request.
+async def open_post(url, body):
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=secure or None
+    )
+    try:
+        data = json.dumps(body).encode()
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        writer.write(
+            (
+                f"POST {path} HTTP/1.1\r\n"
+                f"Host: {parts.netloc}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + data
+        )
+        await writer.drain()
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+# Read an HTTP response's status line and headers as (status, {name: value})
+# with lowercase names.
+async def read_response_head(reader):
+    status_line = await reader.readline()
+    fields = status_line.split(None, 2)
+    if len(fields) < 2 or not fields[1].isdigit():
+        raise ConnectionError(f"Bad HTTP status line: {status_line!r}")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(fields[1]), headers
+
+
+# Read a whole response body, sized, chunked or up to the end of the
+# connection.
+async def read_response_body(reader, headers):
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await reader.readline()
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    return await reader.read()
+
+
+# Yield the lines of a response body as they arrive, without line endings.
+async def iter_response_lines(reader, headers):
+    if "chunked" not in headers.get("transfer-encoding", "").lower():
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield line.rstrip(b"\r\n").decode()
+    pending = b""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            break
+        pending += await reader.readexactly(size)
+        await reader.readline()
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode()
+    if pending:
+        yield pending.rstrip(b"\r").decode()
+
+
+# LLM player that sends several candidate requests at once, at different
+# temperatures, and plays the first valid reply, cancelling the others.
+# A move takes about one round trip however many candidates fail, and at
+# most move_budget seconds.
+class AsyncLLMPlayer(LLMPlayer):
+    TEMPERATURES = (0.0, 0.4, 0.8)
+
+    def __init__(self, color, candidates=3, **kwargs):
+        super().__init__(color, **kwargs)
+        self.candidates = candidates
+
+    def get_move(self, game):
+        return asyncio.run(self.get_move_async(game))
+
+    async def get_move_async(self, game):
+        move = self._local_move(game)
+        if move is not None:
+            return move
+        print(f"\n[LLM {self.color}] Thinking locally...")
+        prompt = self._build_prompt(game)
+        tasks = [
+            asyncio.ensure_future(
+                self._candidate(
+                    game, prompt, self.TEMPERATURES[i % len(self.TEMPERATURES)]
+                )
+            )
+            for i in range(self.candidates)
+        ]
+        message = f"LLM failed to make a valid move with {self.candidates} candidates!"
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=self.move_budget):
+                try:
+                    move = await next_done
+                except asyncio.TimeoutError:
+                    message = f"LLM used its {self.move_budget}s move budget."
+                    break
+                except Exception as e:
+                    print(f"[LLM {self.color}] Connection Error: {e}")
+                    continue
+                if move is not None:
+                    row, col, letter = move
+                    print(
+                        f"[LLM {self.color}] Playing: row={row}, col={col}, letter={letter}"
+                    )
+                    self._store_move(game, move)
+                    return move
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self._fallback_move(game, message)
+
+    # Ask for one candidate move and return it if it is valid, else None.
+    # Streamed replies stop being read at the first valid move.
+    async def _candidate(self, game, prompt, temperature):
+        reader, writer = await open_post(
+            self.api_url, self._request_body(prompt, temperature)
+        )
+        try:
+            status, headers = await read_response_head(reader)
+            if status != 200:
+                body = await read_response_body(reader, headers)
+                print(f"[LLM {self.color}] Server Error: {body[:200]!r}")
+                return None
+            if not self.stream:
+                body = await read_response_body(reader, headers)
+                content = self._response_content(json.loads(body))
+                move = None
+            else:
+                content = ""
+                move = None
+                async for line in iter_response_lines(reader, headers):
+                    text = self._stream_text(line)
+                    if text is None:
+                        break
+                    content += text
+                    move = self._first_valid_move(content, game)
+                    if move is not None:
+                        break
+                content = content.strip()
+        finally:
+            writer.close()
+        print(f"[LLM {self.color}] Response (t={temperature}): {content}")
+        if move is None:
+            move = self._parse_move(content, game)
+        if move and self._is_valid_move(move, game):
+            return move
+        return None
@@ -0,0 +1,201 @@
+# Monte Carlo Tree Search opponent with optional root parallelism.
+import itertools
+import math
+import multiprocessing
+import random
+import time
+from SOSGame import SOSGame
+from player import ComputerPlayer
+
+RANDOM_ROLLOUT = "random"
+GREEDY_ROLLOUT = "greedy"
+
+
+# Search tree node. Wins are counted for the player who made the move
+# leading here, which in General mode may also be the player to move next.
+class MCTSNode:
+    __slots__ = ("move", "parent", "mover", "children", "untried", "visits", "wins")
+
+    def __init__(self, game, rng, move=None, parent=None, mover=None):
+        self.move = move
+        self.parent = parent
+        self.mover = mover
+        self.children = []
+        self.untried = [] if game.game_over else _candidate_moves(game, rng)
+        self.visits = 0
+        self.wins = 0.0
+
+    # Pick the child with the best UCT score.
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(
+            self.children,
+            key=lambda child: child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+
+# Get the moves a node may expand, in the order they are popped. When the
+# side to move can score it only considers scoring moves, best last so it is
+# expanded first: in Simple mode scoring wins outright and in General mode
+# it keeps the turn. Otherwise all legal moves, shuffled.
+def _candidate_moves(game, rng):
+    scoring = game.scoring_moves()
+    if scoring:
+        scoring.sort(key=lambda move: move[3])
+        return [(row, col, letter) for row, col, letter, _ in scoring]
+    moves = [
+        (row, col, letter) for row, col in game.legal_moves() for letter in ("S", "O")
+    ]
+    rng.shuffle(moves)
+    return moves
+
+
+# Play the game out from the current position and return the winner.
+# Greedy rollouts take the best scoring move when there is one.
+def _rollout(game, rollout, rng):
+    played = 0
+    while not game.game_over:
+        move = game.best_scoring_move() if rollout == GREEDY_ROLLOUT else None
+        if move is None:
+            row, col = game.random_empty_cell(rng)
+            move = (row, col, rng.choice(("S", "O")))
+        game.make_move(*move)
+        played += 1
+    winner = game.winner
+    for _ in range(played):
+        game.unmake_move()
+    return winner
+
+
+# Grow one UCT tree from a position and return the root statistics as
+# {move: (visits, wins)}. Stops after the given playouts or at the deadline,
+# whichever comes first; with playouts None only the deadline stops it.
+# Module-level so worker processes can run it.
+def search_tree(state, playouts, time_limit, exploration, rollout, seed):
+    rng = random.Random(seed)
+    game = SOSGame.from_bytes(state) if isinstance(state, bytes) else state
+    root = MCTSNode(game, rng)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    clock = time.perf_counter
+    for _ in itertools.count() if playouts is None else range(playouts):
+        # A rollout costs far more than reading the clock, so check it
+        # before every playout.
+        if deadline is not None and clock() > deadline:
+            break
+        node = root
+        depth = 0
+        # Selection
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            game.make_move(*node.move)
+            depth += 1
+        # Expansion
+        if node.untried:
+            move = node.untried.pop()
+            mover = game.current_player
+            game.make_move(*move)
+            depth += 1
+            child = MCTSNode(game, rng, move, node, mover)
+            node.children.append(child)
+            node = child
+        # Simulation
+        winner = _rollout(game, rollout, rng)
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1.0
+            node = node.parent
+        for _ in range(depth):
+            game.unmake_move()
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+
+# Computer player choosing moves by Monte Carlo Tree Search (UCT).
+# With several workers, each process grows its own tree from the same root
+# and the root visit counts are summed before picking the most visited move.
+# With playouts None the search runs for time_limit seconds, which is then
+# required.
+class MCTSPlayer(ComputerPlayer):
+    def __init__(
+        self,
+        color,
+        playouts=2000,
+        time_limit=None,
+        workers=1,
+        exploration=1.4,
+        rollout=GREEDY_ROLLOUT,
+        book=None,
+    ):
+        super().__init__(color, book)
+        if rollout not in (RANDOM_ROLLOUT, GREEDY_ROLLOUT):
+            raise ValueError(f"Unknown rollout policy: {rollout}")
+        if playouts is None and time_limit is None:
+            raise ValueError("MCTSPlayer needs playouts or a time limit")
+        self._playouts = playouts
+        self._time_limit = time_limit
+        self._workers = workers
+        self._exploration = exploration
+        self._rollout = rollout
+        self._pool = None
+        self._last_stats = {}
+
+    # Root statistics {move: (visits, wins)} from the last search.
+    @property
+    def last_stats(self):
+        return self._last_stats
+
+    def get_move(self, game):
+        if game.game_over or game.empty_count == 0:
+            return None
+        # Always take a book move or an immediate SOS; the tree would find
+        # the SOS anyway.
+        move = self._book_move(game) or self._find_sos_move(game)
+        if move:
+            return move
+        stats = self._search(game)
+        self._last_stats = stats
+        if not stats:
+            return self._random_move(game)
+        return max(stats, key=lambda move: stats[move][0])
+
+    def _search(self, game):
+        if self._workers <= 1:
+            return search_tree(
+                game.clone(),
+                self._playouts,
+                self._time_limit,
+                self._exploration,
+                self._rollout,
+                random.getrandbits(32),
+            )
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._workers)
+        state = game.to_bytes()
+        jobs = [
+            (
+                state,
+                self._playouts,
+                self._time_limit,
+                self._exploration,
+                self._rollout,
+                random.getrandbits(32),
+            )
+            for _ in range(self._workers)
+        ]
+        merged = {}
+        for stats in self._pool.starmap(search_tree, jobs):
+            for move, (visits, wins) in stats.items():
+                total_visits, total_wins = merged.get(move, (0, 0.0))
+                merged[move] = (total_visits + visits, total_wins + wins)
+        return merged
+
+    # Shut down the worker pool, if one was started.
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
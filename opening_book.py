@@ -0,0 +1,194 @@
+# Opening book built from self-play and read through a memory map.
+import mmap
+import os
+import random
+import struct
+from SOSGame import (
+    SOSGame,
+    SimpleGame,
+    GeneralGame,
+    SYMMETRY_INVERSES,
+    transform_cell,
+)
+
+# Book file: magic, version, the number of opening moves covered and the
+# record count, then records sorted by position key. Each record is one
+# move played from a position: key, row and column in the position's
+# canonical image, letter code, games played and points scored by the
+# mover, counting a win as 2 and a draw as 1.
+BOOK_HEADER = struct.Struct("<4sBHQ")
+BOOK_MAGIC = b"SOSB"
+BOOK_VERSION = 1
+BOOK_RECORD = struct.Struct("<QHHBII")
+
+
+# Read-only opening book. Records for a position are found by binary search
+# over the memory-mapped file, so lookups take microseconds and opening a
+# book reads nothing up front.
+class OpeningBook:
+    def __init__(self, path, min_games=1):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, depth, record_count = BOOK_HEADER.unpack_from(self._map)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self._map.close()
+            raise ValueError(f"Not an opening book: {path}")
+        if len(self._map) != BOOK_HEADER.size + record_count * BOOK_RECORD.size:
+            self._map.close()
+            raise ValueError(f"Truncated opening book: {path}")
+        self._depth = depth
+        self._record_count = record_count
+        self._min_games = min_games
+
+    # Number of opening moves the book covers.
+    @property
+    def depth(self):
+        return self._depth
+
+    def __len__(self):
+        return self._record_count
+
+    def close(self):
+        self._map.close()
+
+    def _record(self, i):
+        return BOOK_RECORD.unpack_from(
+            self._map, BOOK_HEADER.size + i * BOOK_RECORD.size
+        )
+
+    # Get the records stored for a position key as (row, col, code, games,
+    # points), with coordinates in the position's canonical image.
+    def _records(self, key):
+        low, high = 0, self._record_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        records = []
+        for i in range(low, self._record_count):
+            record = self._record(i)
+            if record[0] != key:
+                break
+            records.append(record[1:])
+        return records
+
+    def _in_book(self, game):
+        size = game.board_size
+        return size * size - game.empty_count < self._depth
+
+    # Get the book moves for a position as (row, col, letter, games, points)
+    # in the game's own coordinates.
+    def moves(self, game):
+        if not self._in_book(game):
+            return []
+        size = game.board_size
+        inverse = SYMMETRY_INVERSES[game.canonical_symmetry]
+        moves = []
+        for row, col, code, games, points in self._records(game.canonical_hash):
+            row, col = transform_cell(row, col, size, inverse)
+            moves.append((row, col, SOSGame.CODE_LETTERS[code], games, points))
+        return moves
+
+    # Get the book move with the best average result, or None if the
+    # position is not in the book or no move was played min_games times.
+    def lookup(self, game):
+        if not self._in_book(game):
+            return None
+        best = None
+        best_average = -1.0
+        for row, col, code, games, points in self._records(game.canonical_hash):
+            if games >= self._min_games and points / games > best_average:
+                best = (row, col, code)
+                best_average = points / games
+        if best is None:
+            return None
+        row, col, code = best
+        inverse = SYMMETRY_INVERSES[game.canonical_symmetry]
+        row, col = transform_cell(row, col, game.board_size, inverse)
+        if game.get_cell(row, col) != SOSGame.EMPTY:
+            return None
+        return (row, col, SOSGame.CODE_LETTERS[code])
+
+    # Write {(key, row, col, code): (games, points)} as a sorted book file.
+    # The file is written next to the target and renamed into place.
+    @staticmethod
+    def write(path, stats, depth):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, depth, len(stats)))
+            for entry in sorted(stats):
+                f.write(BOOK_RECORD.pack(*entry, *stats[entry]))
+        os.replace(temp_path, path)
+
+
+# Play games between two players made by make_player(color) and gather
+# results for the first depth moves of each, keyed by canonical position
+# and the move mapped into that position's canonical image. Returns
+# {(key, row, col, code): (games, points)} to pass to OpeningBook.write().
+def self_play_stats(
+    game_class, board_size, make_player, games, depth, stats=None, rng=random
+):
+    if stats is None:
+        stats = {}
+    for _ in range(games):
+        game = game_class(board_size=board_size)
+        players = {
+            SOSGame.BLUE: make_player(SOSGame.BLUE),
+            SOSGame.RED: make_player(SOSGame.RED),
+        }
+        opening = []
+        while not game.game_over:
+            mover = game.current_player
+            move = players[mover].get_move(game)
+            if move is None:
+                row, col = game.random_empty_cell(rng)
+                move = (row, col, rng.choice("SO"))
+            row, col, letter = move
+            if len(opening) < depth:
+                image_row, image_col = transform_cell(
+                    row, col, board_size, game.canonical_symmetry
+                )
+                entry = (
+                    game.canonical_hash,
+                    image_row,
+                    image_col,
+                    SOSGame.LETTER_CODES[letter],
+                )
+                opening.append((entry, mover))
+            game.make_move(row, col, letter)
+        for entry, mover in opening:
+            if game.winner is None:
+                points = 1
+            else:
+                points = 2 if game.winner == mover else 0
+            played, scored = stats.get(entry, (0, 0))
+            stats[entry] = (played + 1, scored + points)
+    return stats
+
+
+def main():
+    import argparse
+    from player import HeuristicPlayer
+
+    parser = argparse.ArgumentParser(description="Build an SOS opening book.")
+    parser.add_argument("path", help="book file to write")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument(
+        "--mode", choices=[SOSGame.SIMPLE, SOSGame.GENERAL], default=SOSGame.SIMPLE
+    )
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args()
+
+    game_class = SimpleGame if args.mode == SOSGame.SIMPLE else GeneralGame
+    stats = self_play_stats(
+        game_class, args.size, HeuristicPlayer, args.games, args.depth
+    )
+    OpeningBook.write(args.path, stats, args.depth)
+    print(f"{len(stats)} book moves from {args.games} games")
+
+
+if __name__ == "__main__":
+    main()
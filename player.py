@@ -1,6 +1,17 @@
 # Player class hierarchy for computer opponent
+import math
 import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from SOSGame import SOSGame, LazyCellTable, cell_lines, S_CODE, O_CODE
+from transposition import TranspositionTable
+from opening_book import OpeningBook
+
+# Search values: a won Simple game is worth WIN_SCORE minus the plies taken,
+# so faster wins score higher.
+WIN_SCORE = 1000000
+INFINITY = 10 * WIN_SCORE
 
 
 class Player(ABC):
@@ -25,42 +36,506 @@ class HumanPlayer(Player):
 
 
 class ComputerPlayer(Player):
-    def __init__(self, color):
+    # book is an OpeningBook or the path of a book file to open.
+    def __init__(self, color, book=None):
         super().__init__(color)
+        if isinstance(book, str):
+            book = OpeningBook(book)
+        self._book = book
+
+    # Opening book consulted before anything else, or None.
+    @property
+    def book(self):
+        return self._book
+
+    @book.setter
+    def book(self, book):
+        self._book = book
 
     def get_move(self, game):
+        move = self._book_move(game)
+        if move:
+            return move
         # Try to find a winning/blocking SOS move first
         move = self._find_sos_move(game)
         if move:
             return move
         return self._random_move(game)
 
-    # Find any move that creates an SOS.
-    def _find_sos_move(self, game):
-        for row in range(game.board_size):
-            for col in range(game.board_size):
-                if game.get_cell(row, col) == game.EMPTY:
-                    if self._creates_sos(game, row, col, "S"):
-                        return (row, col, "S")
-                    if self._creates_sos(game, row, col, "O"):
-                        return (row, col, "O")
-        return None
+    # Get the opening book's move for the position, if there is one.
+    def _book_move(self, game):
+        if self._book is None:
+            return None
+        return self._book.lookup(game)
 
-    def _creates_sos(self, game, row, col, letter):
-        original = game._board[row][col]
-        game._board[row][col] = letter
-        sequences = game._detect_sos(row, col)
-        game._board[row][col] = original
-        return len(sequences) > 0
+    # Find the move that creates the most SOS.
+    def _find_sos_move(self, game):
+        return game.best_scoring_move()
 
     def _random_move(self, game):
-        valid_moves = []
-        for row in range(game.board_size):
-            for col in range(game.board_size):
-                if game.get_cell(row, col) == game.EMPTY:
-                    valid_moves.append((row, col))
-        if valid_moves:
-            row, col = random.choice(valid_moves)
+        cell = game.random_empty_cell()
+        if cell:
+            row, col = cell
             letter = random.choice(["S", "O"])
             return (row, col, letter)
         return None
+
+
+# Tracks which moves hand the opponent an SOS: for every empty cell sharing
+# a line with a letter on the board, how many SOS the opponent could form
+# next if S or O were placed there. Every other empty cell is safe. The
+# analysis follows the game's move history, so each update only re-examines
+# the cells around the moves made or taken back since the last one.
+class PoisonedCells:
+    def __init__(self):
+        self._size = None
+        self._lines = None
+        self._cells = {}
+        self._history = []
+        self._gifts = {}
+
+    # Poisoned moves as {(row, col, letter): SOS given away}.
+    @property
+    def poisoned(self):
+        moves = {}
+        for index, gifts in self._gifts.items():
+            row, col = divmod(index, self._size)
+            for letter, gift in zip(("S", "O"), gifts):
+                if gift:
+                    moves[(row, col, letter)] = gift
+        return moves
+
+    # Get how many SOS placing a letter at (row, col) would give away.
+    def gift(self, row, col, letter):
+        gifts = self._gifts.get(row * self._size + col)
+        if gifts is None:
+            return 0
+        return gifts[0] if letter == "S" else gifts[1]
+
+    def is_safe(self, row, col, letter):
+        return self.gift(row, col, letter) == 0
+
+    # Catch up with the game. Moves after the longest common prefix of the
+    # last seen history and the game's are removed and the game's are added;
+    # if the board still does not match, e.g. for a clone, which has no
+    # history, the analysis is rebuilt.
+    def update(self, game):
+        history = game.move_history
+        if game.board_size != self._size:
+            self._rebuild(game)
+            return
+        # Moves after the first difference are replayed, even if later
+        # entries match again, since they were played on another board.
+        limit = min(len(self._history), len(history))
+        common = 0
+        while common < limit and self._history[common] == history[common]:
+            common += 1
+        dirty = set()
+        size = self._size
+        while len(self._history) > common:
+            move = self._history.pop()
+            index = move["row"] * size + move["col"]
+            del self._cells[index]
+            dirty.add(index)
+        for move in history[common:]:
+            index = move["row"] * size + move["col"]
+            self._cells[index] = SOSGame.LETTER_CODES[move["letter"]]
+            self._history.append(move)
+            dirty.add(index)
+        if len(self._cells) != size * size - game.empty_count:
+            self._rebuild(game)
+            return
+        self._refresh(dirty)
+
+    # Read the whole board again. Uses the move history when it accounts
+    # for every letter, otherwise scans every cell.
+    def _rebuild(self, game):
+        size = game.board_size
+        self._size = size
+        self._lines = LazyCellTable(
+            lambda index: cell_lines(*divmod(index, size), size)
+        )
+        self._cells = {}
+        self._history = list(game.move_history)
+        self._gifts = {}
+        if len(self._history) == size * size - game.empty_count:
+            for move in self._history:
+                index = move["row"] * size + move["col"]
+                self._cells[index] = SOSGame.LETTER_CODES[move["letter"]]
+        else:
+            for index in range(size * size):
+                letter = game.get_cell(*divmod(index, size))
+                if letter != SOSGame.EMPTY:
+                    self._cells[index] = SOSGame.LETTER_CODES[letter]
+        self._refresh(self._cells)
+
+    # Recompute the gifts of the changed cells and every cell in line with
+    # them, since a cell's gifts only depend on the cells it shares a line
+    # with.
+    def _refresh(self, changed):
+        lines = self._lines
+        cells = self._cells
+        gifts = self._gifts
+        affected = set()
+        for index in changed:
+            affected.add(index)
+            affected.update(lines[index][2])
+        for index in affected:
+            if index in cells:
+                gifts.pop(index, None)
+                continue
+            cell_gifts = self._cell_gifts(index)
+            if cell_gifts == (0, 0):
+                gifts.pop(index, None)
+            else:
+                gifts[index] = cell_gifts
+
+    # Count the SOS the opponent could complete after an S or an O at an
+    # empty cell, scored the way SOSGame scores them: an O completing an
+    # SOS counts it once from each end.
+    def _cell_gifts(self, index):
+        cells = self._cells
+        from_s, around_o, _ = self._lines[index]
+        s_gift = 0
+        for middle, end in from_s:
+            middle_code = cells.get(middle)
+            end_code = cells.get(end)
+            if middle_code == O_CODE and end_code is None:
+                s_gift += 1
+            elif middle_code is None and end_code == S_CODE:
+                s_gift += 2
+        o_gift = 0
+        for before, after in around_o:
+            if cells.get(before) == S_CODE and after not in cells:
+                o_gift += 1
+        return s_gift, o_gift
+
+    # Pick a random move that gives nothing away, or else the one giving
+    # away the fewest SOS. Random draws are tried first so large, mostly
+    # safe boards are never scanned.
+    def safest_move(self, game, rng=random, tries=32):
+        if game.empty_count == 0:
+            return None
+        for _ in range(tries):
+            row, col = game.random_empty_cell(rng)
+            letter = rng.choice(("S", "O"))
+            if self.is_safe(row, col, letter):
+                return (row, col, letter)
+        moves = [
+            (row, col, letter)
+            for row, col in game.legal_moves()
+            for letter in ("S", "O")
+        ]
+        safe = [move for move in moves if self.is_safe(*move)]
+        if safe:
+            return rng.choice(safe)
+        fewest = min(self.gift(*move) for move in moves)
+        return rng.choice([move for move in moves if self.gift(*move) == fewest])
+
+
+# Computer player that scores when it can and otherwise avoids moves that
+# set up an SOS for the opponent.
+class HeuristicPlayer(ComputerPlayer):
+    def __init__(self, color, book=None):
+        super().__init__(color, book)
+        self._poisoned = PoisonedCells()
+
+    @property
+    def poisoned_cells(self):
+        return self._poisoned
+
+    def get_move(self, game):
+        if game.game_over or game.empty_count == 0:
+            return None
+        move = self._book_move(game) or self._find_sos_move(game)
+        if move:
+            return move
+        self._poisoned.update(game)
+        return self._poisoned.safest_move(game)
+
+
+# Raised inside a search when its time budget runs out.
+class SearchTimeout(Exception):
+    pass
+
+
+# Computer player using iterative-deepening alpha-beta search.
+# Values are from the side to move's point of view: in Simple mode a win,
+# draw or loss; in General mode the SOS it will still score minus those the
+# opponent will, so positions reached by different move orders share
+# transposition table entries.
+class SearchPlayer(ComputerPlayer):
+    def __init__(
+        self, color, time_limit=1.0, max_depth=None, table_size=1 << 18, book=None
+    ):
+        super().__init__(color, book)
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._table = TranspositionTable(table_size)
+        self._deadline = None
+        self._nodes = 0
+        self._last_depth = 0
+        self._last_value = 0
+        self._ponder_thread = None
+        self._ponder_stop = threading.Event()
+        self._ponder_position = None
+        self._ponder_result = None
+        self._ponder_hits = 0
+
+    @property
+    def time_limit(self):
+        return self._time_limit
+
+    # Number of moves answered from a ponder search.
+    @property
+    def ponder_hits(self):
+        return self._ponder_hits
+
+    @property
+    def pondering(self):
+        return self._ponder_thread is not None
+
+    # Nodes, depth and value of the last completed search iteration.
+    @property
+    def last_search(self):
+        return {
+            "nodes": self._nodes,
+            "depth": self._last_depth,
+            "value": self._last_value,
+        }
+
+    def get_move(self, game):
+        if game.game_over or game.empty_count == 0:
+            return None
+        pondered = self._stop_pondering()
+        move = self._book_move(game)
+        if move:
+            return move
+        time_limit = self._time_limit
+        if pondered is not None:
+            key, move, seconds = pondered
+            if key == game.position_hash and move is not None:
+                # Ponder hit: the search so far counts against this move's
+                # time, and a finished search answers at once.
+                self._ponder_hits += 1
+                time_limit -= seconds
+                if time_limit <= 0:
+                    return move
+                best = self._search(game.clone(), time.perf_counter() + time_limit)
+                return best or move
+        best = self._search(game.clone(), time.perf_counter() + time_limit)
+        if best is None:
+            return super().get_move(game)
+        return best
+
+    # Think on the opponent's time. A background thread searches the
+    # opponent's position to guess their reply, then searches our answer to
+    # it until the next get_move() or stop_pondering(). If the guess was
+    # right the move is ready; if not, the transposition table still holds
+    # what the thread learned.
+    def ponder(self, game):
+        self._stop_pondering()
+        if game.game_over or game.empty_count == 0:
+            return
+        self._ponder_thread = threading.Thread(
+            target=self._ponder, args=(game.clone(),), daemon=True
+        )
+        self._ponder_thread.start()
+
+    def stop_pondering(self):
+        self._stop_pondering()
+
+    # Stop the ponder thread and return (position hash, move, seconds) for
+    # the position it answered, or None. Seconds is infinite if the search
+    # there finished.
+    def _stop_pondering(self):
+        thread = self._ponder_thread
+        if thread is None:
+            return None
+        self._ponder_stop.set()
+        thread.join()
+        self._ponder_stop.clear()
+        self._ponder_thread = None
+        if self._ponder_position is None:
+            return None
+        key, started = self._ponder_position
+        move, complete = self._ponder_result or (None, False)
+        self._ponder_position = None
+        self._ponder_result = None
+        seconds = math.inf if complete else time.perf_counter() - started
+        return key, move, seconds
+
+    def _ponder(self, game):
+        guess = self._search(game, time.perf_counter() + self._time_limit / 2)
+        if guess is None or self._ponder_stop.is_set():
+            return
+        game.make_move(*guess)
+        if game.game_over or game.current_player != self.color:
+            return
+        self._ponder_position = (game.position_hash, time.perf_counter())
+        move = self._search(game, math.inf)
+        if move is not None:
+            # A search that ends before being stopped is final.
+            self._ponder_result = (move, not self._ponder_stop.is_set())
+
+    # Deepen until time runs out, the game tree is exhausted or the result
+    # is decided. Returns the best move of the deepest finished iteration.
+    def _search(self, game, deadline):
+        self._deadline = deadline
+        self._nodes = 0
+        self._last_depth = 0
+        self._table.new_search()
+        max_depth = game.empty_count
+        if self._max_depth is not None:
+            max_depth = min(max_depth, self._max_depth)
+        best = None
+        for depth in range(1, max_depth + 1):
+            try:
+                value, move = self._search_root(game, depth)
+            except SearchTimeout:
+                break
+            best = move
+            self._last_depth = depth
+            self._last_value = value
+            if abs(value) >= WIN_SCORE - max_depth:
+                break
+        return best
+
+    # Search all root moves to a fixed depth, returning (value, move).
+    def _search_root(self, game, depth):
+        alpha = -INFINITY
+        best_move = None
+        for row, col, letter, count in self._ordered_moves(game, self._tt_move(game)):
+            value = self._play(game, row, col, letter, count, depth, alpha, INFINITY, 0)
+            if best_move is None or value > alpha:
+                alpha = value
+                best_move = (row, col, letter)
+        self._table.store(
+            game.position_hash, depth, alpha, TranspositionTable.EXACT, best_move
+        )
+        return alpha, best_move
+
+    # Alpha-beta negamax over the side to move's future SOS balance.
+    def _negamax(self, game, depth, alpha, beta, ply):
+        self._count_node()
+        if game.game_over:
+            return 0
+        if depth <= 0:
+            return self._quiesce(game, ply)
+
+        key = game.position_hash
+        tt_move = None
+        entry = self._table.probe(key)
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return value
+                if flag == TranspositionTable.LOWER_BOUND and value >= beta:
+                    return value
+                if flag == TranspositionTable.UPPER_BOUND and value <= alpha:
+                    return value
+
+        original_alpha = alpha
+        best_value = -INFINITY
+        best_move = None
+        for row, col, letter, count in self._ordered_moves(game, tt_move):
+            value = self._play(game, row, col, letter, count, depth, alpha, beta, ply)
+            if value > best_value:
+                best_value = value
+                best_move = (row, col, letter)
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best_value <= original_alpha:
+            flag = TranspositionTable.UPPER_BOUND
+        elif best_value >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        self._table.store(key, depth, best_value, flag, best_move)
+        return best_value
+
+    # Make a move, search the reply and take the move back. A General mode
+    # move that scores keeps the turn, so the child value is added instead
+    # of negated.
+    def _play(self, game, row, col, letter, count, depth, alpha, beta, ply):
+        mover = game.current_player
+        game.make_move(row, col, letter)
+        try:
+            if game.game_mode == SOSGame.SIMPLE:
+                if count:
+                    return WIN_SCORE - ply
+                if game.game_over:
+                    return 0
+                return -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            if game.current_player == mover:
+                child = self._negamax(
+                    game, depth - 1, alpha - count, beta - count, ply + 1
+                )
+                return count + child
+            child = self._negamax(game, depth - 1, count - beta, count - alpha, ply + 1)
+            return count - child
+        finally:
+            game.unmake_move()
+
+    # Count a searched node, checking every 256 nodes whether the search
+    # must stop.
+    def _count_node(self):
+        self._nodes += 1
+        if self._nodes & 255 == 0 and (
+            time.perf_counter() > self._deadline or self._ponder_stop.is_set()
+        ):
+            raise SearchTimeout()
+
+    # Value a horizon position by letting the side to move cash in its
+    # best scoring move, repeatedly in General mode while it keeps the turn.
+    # The chain is played out in a loop, as it can be as long as the board
+    # has open threats.
+    def _quiesce(self, game, ply):
+        if game.game_mode == SOSGame.SIMPLE:
+            return WIN_SCORE - ply if game.best_scoring_move() else 0
+        mover = game.current_player
+        total = 0
+        made = 0
+        try:
+            while not game.game_over and game.current_player == mover:
+                best = game.best_scoring_move()
+                if best is None:
+                    break
+                row, col, letter = best
+                total += game.sos_count_at(row, col, letter)
+                game.make_move(row, col, letter)
+                made += 1
+                self._count_node()
+        finally:
+            for _ in range(made):
+                game.unmake_move()
+        return total
+
+    def _tt_move(self, game):
+        entry = self._table.probe(game.position_hash)
+        return entry[3] if entry is not None else None
+
+    # Get (row, col, letter, count) for every legal move: the table move
+    # first, then scoring moves by SOS formed, then the rest in random order.
+    def _ordered_moves(self, game, tt_move):
+        scoring = sorted(game.scoring_moves(), key=lambda move: -move[3])
+        seen = {(row, col, letter) for row, col, letter, _ in scoring}
+        cells = game.legal_moves()
+        random.shuffle(cells)
+        quiet = [
+            (row, col, letter, 0)
+            for row, col in cells
+            for letter in ("S", "O")
+            if (row, col, letter) not in seen
+        ]
+        moves = scoring + quiet
+        if tt_move is not None:
+            for i, move in enumerate(moves):
+                if move[:3] == tt_move:
+                    moves.insert(0, moves.pop(i))
+                    break
+        return moves
@@ -0,0 +1,262 @@
+# Exact solver for small boards and endgames, with on-disk solution tables.
+import mmap
+import os
+import struct
+from SOSGame import SOSGame, ZOBRIST_SIDE_KEY
+from player import HeuristicPlayer
+
+# Solution table file: magic, version, slot count and entry count, then one
+# (key, value) slot per table slot. Key 0 marks an empty slot.
+TABLE_HEADER = struct.Struct("<4sBQQ")
+TABLE_MAGIC = b"SOSV"
+TABLE_VERSION = 1
+TABLE_SLOT = struct.Struct("<Qh")
+
+
+# Key a position by its canonical hash without the side to move. Values are
+# relative to the side to move and the rules treat both sides alike, so a
+# board has the same value whoever is to play it. 0 is reserved for empty
+# table slots.
+def solution_key(game):
+    key = game.canonical_hash
+    if game.current_player == SOSGame.RED:
+        key ^= ZOBRIST_SIDE_KEY
+    return key or 1
+
+
+# Read-only solution table memory-mapped from a file written by write().
+# Lookups probe the mapped slots directly, so opening a table costs nothing
+# however large it is.
+class SolutionTable:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slot_count, entry_count = TABLE_HEADER.unpack_from(self._map)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            self._map.close()
+            raise ValueError(f"Not a solution table: {path}")
+        if len(self._map) != TABLE_HEADER.size + slot_count * TABLE_SLOT.size:
+            self._map.close()
+            raise ValueError(f"Truncated solution table: {path}")
+        self._mask = slot_count - 1
+        self._entry_count = entry_count
+
+    def __len__(self):
+        return self._entry_count
+
+    # Get the stored value for a key, or None.
+    def get(self, key):
+        slot = key & self._mask
+        while True:
+            stored, value = TABLE_SLOT.unpack_from(
+                self._map, TABLE_HEADER.size + slot * TABLE_SLOT.size
+            )
+            if stored == key:
+                return value
+            if stored == 0:
+                return None
+            slot = (slot + 1) & self._mask
+
+    # Iterate over (key, value) pairs.
+    def items(self):
+        for stored, value in TABLE_SLOT.iter_unpack(self._map[TABLE_HEADER.size :]):
+            if stored:
+                yield stored, value
+
+    def close(self):
+        self._map.close()
+
+    # Write {key: value} as an open-addressing table at most half full.
+    # The file is written next to the target and renamed into place.
+    @staticmethod
+    def write(path, values):
+        slot_count = 1
+        while slot_count < 2 * len(values):
+            slot_count <<= 1
+        mask = slot_count - 1
+        slots = bytearray(slot_count * TABLE_SLOT.size)
+        for key, value in values.items():
+            slot = key & mask
+            while TABLE_SLOT.unpack_from(slots, slot * TABLE_SLOT.size)[0]:
+                slot = (slot + 1) & mask
+            TABLE_SLOT.pack_into(slots, slot * TABLE_SLOT.size, key, value)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(
+                TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, slot_count, len(values))
+            )
+            f.write(slots)
+        os.replace(temp_path, path)
+
+
+# Computes exact game values by memoized search over canonical positions.
+# A value is from the side to move's point of view and covers only the
+# rest of the game: in Simple mode 1 for a win, 0 for a draw and -1 for a
+# loss; in General mode the SOS the side to move will still score minus
+# those the opponent will. Results already in a solution table are used
+# instead of searching.
+class Solver:
+    def __init__(self, table=None):
+        self._table = table
+        self._values = {}
+
+    @property
+    def table(self):
+        return self._table
+
+    # Number of positions solved by this solver, not counting the table.
+    @property
+    def solved(self):
+        return len(self._values)
+
+    # Get the stored value of a position, or None if it is not solved yet.
+    def lookup(self, game):
+        key = solution_key(game)
+        value = self._values.get(key)
+        if value is None and self._table is not None:
+            value = self._table.get(key)
+        return value
+
+    # Get the exact value of a position, searching if needed. Practical for
+    # whole 3x3 boards, Simple mode 4x4 boards and endgames with about a
+    # dozen empty cells; the search visits every reachable board.
+    def value(self, game):
+        return self._solve(game.clone())
+
+    # Get (move, value) for the best move, or (None, 0) if the game is over.
+    # The value is the position's value, as from value().
+    def best_move(self, game):
+        if game.game_over:
+            return None, 0
+        game = game.clone()
+        moves = self._moves(game)
+        # A solved position's best move leads to a solved position, so look
+        # for it by lookups alone before searching.
+        value = self.lookup(game)
+        if value is not None:
+            for move in moves:
+                if self._move_value(game, *move, self._lookup_child) == value:
+                    return move, value
+        best = None
+        best_value = None
+        for move in moves:
+            move_value = self._move_value(game, *move, self._solve)
+            if best_value is None or move_value > best_value:
+                best = move
+                best_value = move_value
+        return best, best_value
+
+    # Write every value this solver knows, including its table's, to a
+    # solution table file.
+    def save(self, path):
+        values = {}
+        if self._table is not None:
+            values.update(self._table.items())
+        values.update(self._values)
+        SolutionTable.write(path, values)
+
+    def _solve(self, game):
+        if game.game_over:
+            return 0
+        key = solution_key(game)
+        value = self._values.get(key)
+        if value is None and self._table is not None:
+            value = self._table.get(key)
+        if value is not None:
+            return value
+        if game.game_mode == SOSGame.SIMPLE and game.scoring_moves():
+            value = 1
+        else:
+            value = None
+            for row, col, letter in self._moves(game):
+                move_value = self._move_value(game, row, col, letter, self._solve)
+                if value is None or move_value > value:
+                    value = move_value
+                    if game.game_mode == SOSGame.SIMPLE and value == 1:
+                        break
+        self._values[key] = value
+        return value
+
+    def _lookup_child(self, game):
+        if game.game_over:
+            return 0
+        return self.lookup(game)
+
+    # Value of a move for the side making it, valuing the next position
+    # with solve(), or None if that gives None. A General mode move that
+    # scores keeps the turn, so the next position's value is added.
+    def _move_value(self, game, row, col, letter, solve):
+        mover = game.current_player
+        count = game.sos_count_at(row, col, letter)
+        game.make_move(row, col, letter)
+        try:
+            if game.game_mode == SOSGame.SIMPLE and count:
+                return 1
+            child = solve(game)
+            if child is None:
+                return None
+            if game.game_mode == SOSGame.SIMPLE:
+                return -child
+            if game.current_player == mover:
+                return count + child
+            return count - child
+        finally:
+            game.unmake_move()
+
+    def _moves(self, game):
+        return [
+            (row, col, letter) for row, col in game.legal_moves() for letter in "SO"
+        ]
+
+
+# Computer player that plays perfectly once a position is solvable: when
+# its solution table covers the position or few enough cells remain.
+# Earlier moves come from HeuristicPlayer.
+class SolverPlayer(HeuristicPlayer):
+    def __init__(self, color, table_path=None, endgame_cells=8, book=None):
+        super().__init__(color, book)
+        table = None
+        if table_path is not None and os.path.exists(table_path):
+            table = SolutionTable(table_path)
+        self._solver = Solver(table)
+        self._endgame_cells = endgame_cells
+
+    @property
+    def solver(self):
+        return self._solver
+
+    def get_move(self, game):
+        if game.game_over or game.empty_count == 0:
+            return None
+        if (
+            game.empty_count <= self._endgame_cells
+            or self._solver.lookup(game) is not None
+        ):
+            move, _ = self._solver.best_move(game)
+            return move
+        return super().get_move(game)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Solve an SOS board from empty.")
+    parser.add_argument("path", help="solution table file to write")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument(
+        "--mode", choices=[SOSGame.SIMPLE, SOSGame.GENERAL], default=SOSGame.SIMPLE
+    )
+    args = parser.parse_args()
+    from SOSGame import SimpleGame, GeneralGame
+
+    game_class = SimpleGame if args.mode == SOSGame.SIMPLE else GeneralGame
+    solver = Solver()
+    value = solver.value(game_class(board_size=args.size))
+    solver.save(args.path)
+    print(
+        f"{args.mode} {args.size}x{args.size}: value {value}, {solver.solved} positions"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,60 @@
 import unittest
+import contextlib
+import io
+import json
+import http.server
 import os
+import pickle
+import random
+import socket
+import threading
+import tempfile
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from game_recorder import GameRecorder
 from game_replayer import GameReplayer
-from SOSGame import SOSGame, SimpleGame, GeneralGame
-from player import Player, HumanPlayer, ComputerPlayer
+from SOSGame import (
+    SOSGame,
+    SimpleGame,
+    GeneralGame,
+    SYMMETRY_COUNT,
+    SYMMETRY_INVERSES,
+    transform_cell,
+)
+from player import (
+    Player,
+    HumanPlayer,
+    ComputerPlayer,
+    SearchPlayer,
+    PoisonedCells,
+    HeuristicPlayer,
+)
+from mcts_player import MCTSPlayer, RANDOM_ROLLOUT, search_tree
+from solver import Solver, SolutionTable, SolverPlayer, solution_key
+from opening_book import OpeningBook, self_play_stats
+from benchmarks import find_regressions, run_benchmarks
+from llm_player import LLMPlayer, AsyncLLMPlayer, MoveCache, shared_session
+import instrumentation
+from tournament import (
+    make_player,
+    schedule,
+    play_game,
+    run_jobs,
+    load_results,
+    fit_elo,
+    elo_with_intervals,
+    format_report,
+)
+from transposition import TranspositionTable
+
+if numpy is not None:
+    from batch_game import BatchSOSGame
+    from evaluator import evaluate, evaluate_game, board_array, boards_array
 
 
 class TestUserStory1_ChooseBoardSize(unittest.TestCase):
@@ -220,8 +271,8 @@ class TestUserStory8_ComputerOpponent(unittest.TestCase):
         computer = ComputerPlayer("blue")
 
         # Set up board where S-O-? allows computer to complete SOS
-        game._board[0][0] = "S"
-        game._board[0][1] = "O"
+        game.make_move(0, 0, "S")
+        game.make_move(0, 1, "O")
         # Position (0,2) with 'S' would complete SOS
 
         move = computer.get_move(game)
@@ -236,8 +287,8 @@ class TestUserStory8_ComputerOpponent(unittest.TestCase):
         computer = ComputerPlayer("blue")
 
         # Set up board where opponent could win
-        game._board[1][0] = "S"
-        game._board[1][1] = "O"
+        game.make_move(1, 0, "S")
+        game.make_move(1, 1, "O")
         # Position (1,2) with 'S' would complete SOS for opponent
 
         move = computer.get_move(game)
@@ -404,5 +455,1477 @@ class TestUserStory9_RecordReplay(unittest.TestCase):
             self.replayer.load_game("nonexistent_file.json")
 
 
+class TestBoardBackends(unittest.TestCase):
+    def test_array_backend_matches_list_backend(self):
+        moves = [(0, 0, "S"), (1, 0, "S"), (0, 1, "O"), (1, 1, "O"), (0, 2, "S")]
+        list_game = GeneralGame(board_size=3)
+        array_game = GeneralGame(board_size=3, board_backend=SOSGame.ARRAY_BOARD)
+        for row, col, letter in moves:
+            self.assertTrue(list_game.make_move(row, col, letter))
+            self.assertTrue(array_game.make_move(row, col, letter))
+
+        self.assertEqual(array_game.board_backend, SOSGame.ARRAY_BOARD)
+        self.assertEqual(array_game.blue_score, list_game.blue_score)
+        self.assertEqual(array_game.sos_lines, list_game.sos_lines)
+        for row in range(3):
+            for col in range(3):
+                self.assertEqual(
+                    array_game.get_cell(row, col), list_game.get_cell(row, col)
+                )
+
+    def test_backend_validation_and_reset(self):
+        with self.assertRaises(ValueError):
+            SimpleGame(board_size=3, board_backend="tape")
+
+        game = SimpleGame(board_size=3)
+        game.make_move(0, 0, "S")
+        game.reset_game(board_size=4, board_backend=SOSGame.ARRAY_BOARD)
+        self.assertEqual(game.board_backend, SOSGame.ARRAY_BOARD)
+        self.assertEqual(game.get_cell(0, 0), SOSGame.EMPTY)
+        self.assertTrue(game.make_move(3, 3, "O"))
+
+
+class TestEmptyCellTracking(unittest.TestCase):
+    def test_legal_moves_track_placements(self):
+        game = GeneralGame(board_size=3)
+        self.assertEqual(game.empty_count, 9)
+        self.assertEqual(len(game.legal_moves()), 9)
+
+        game.make_move(1, 1, "S")
+        game.make_move(0, 2, "O")
+        self.assertEqual(game.empty_count, 7)
+        self.assertNotIn((1, 1), game.legal_moves())
+        self.assertNotIn((0, 2), game.legal_moves())
+        self.assertEqual(
+            sorted(game.legal_moves()),
+            sorted(
+                (row, col)
+                for row in range(3)
+                for col in range(3)
+                if game.get_cell(row, col) == SOSGame.EMPTY
+            ),
+        )
+
+        game.reset_game()
+        self.assertEqual(game.empty_count, 9)
+
+    def test_free_cells_built_after_moves(self):
+        for backend in (SOSGame.LIST_BOARD, SOSGame.ARRAY_BOARD):
+            game = GeneralGame(board_size=4, board_backend=backend)
+            game.make_move(1, 1, "S")
+            game.make_move(2, 3, "O")
+            game.unmake_move()
+            # The free cells are first needed here, after the moves.
+            self.assertEqual(len(game.legal_moves()), 15)
+            game.make_move(0, 0, "O")
+            game.make_move(3, 3, "S")
+            game.unmake_move()
+            clone = game.clone()
+            expected = sorted(
+                (row, col)
+                for row in range(4)
+                for col in range(4)
+                if game.get_cell(row, col) == SOSGame.EMPTY
+            )
+            self.assertEqual(sorted(game.legal_moves()), expected)
+            self.assertEqual(sorted(clone.legal_moves()), expected)
+            self.assertIn(game.random_empty_cell(), expected)
+
+    def test_random_empty_cell_on_full_board(self):
+        game = GeneralGame(board_size=3)
+        while not game.game_over:
+            row, col = game.random_empty_cell()
+            self.assertEqual(game.get_cell(row, col), SOSGame.EMPTY)
+            game.make_move(row, col, "O")
+        self.assertEqual(game.empty_count, 0)
+        self.assertEqual(game.legal_moves(), [])
+        self.assertIsNone(game.random_empty_cell())
+
+
+class TestUnmakeMove(unittest.TestCase):
+    # Snapshot of everything unmake_move must restore.
+    def _snapshot(self, game):
+        return (
+            [game.get_cell(row, col) for row in range(3) for col in range(3)],
+            game.current_player,
+            game.blue_score,
+            game.red_score,
+            game.game_over,
+            game.winner,
+            list(game.sos_lines),
+            list(game.move_history),
+            sorted(game.legal_moves()),
+        )
+
+    def test_unmake_restores_each_position(self):
+        game = GeneralGame(board_size=3)
+        moves = [
+            (0, 0, "S"),
+            (1, 0, "S"),
+            (0, 1, "O"),
+            (1, 1, "O"),
+            (0, 2, "S"),
+            (2, 0, "O"),
+            (2, 1, "O"),
+            (1, 2, "O"),
+            (2, 2, "O"),
+        ]
+        snapshots = []
+        for row, col, letter in moves:
+            snapshots.append(self._snapshot(game))
+            self.assertTrue(game.make_move(row, col, letter))
+        self.assertTrue(game.game_over)
+
+        for snapshot in reversed(snapshots):
+            self.assertTrue(game.unmake_move())
+            self.assertEqual(self._snapshot(game), snapshot)
+        self.assertFalse(game.can_unmake)
+        self.assertFalse(game.unmake_move())
+
+    def test_unmake_reopens_simple_game(self):
+        game = SimpleGame(board_size=3)
+        game.make_move(0, 0, "S")
+        game.make_move(1, 1, "O")
+        game.make_move(2, 2, "S")
+        self.assertTrue(game.game_over)
+
+        game.unmake_move()
+        self.assertFalse(game.game_over)
+        self.assertIsNone(game.winner)
+        self.assertEqual(game.blue_score, 0)
+        self.assertEqual(game.current_player, SOSGame.BLUE)
+        self.assertTrue(game.make_move(2, 2, "O"))
+
+
+class TestThreatIndex(unittest.TestCase):
+    def test_scoring_moves_follow_the_board(self):
+        game = GeneralGame(board_size=4)
+        self.assertEqual(game.scoring_moves(), [])
+
+        game.make_move(0, 0, "S")
+        game.make_move(0, 2, "S")
+        self.assertEqual(game.scoring_moves(), [(0, 1, "O", 2)])
+        self.assertEqual(game.sos_count_at(0, 1, "O"), 2)
+        self.assertEqual(game.sos_count_at(0, 1, "S"), 0)
+
+        game.make_move(1, 1, "O")
+        self.assertEqual(
+            sorted(game.scoring_moves()),
+            [(0, 1, "O", 2), (2, 0, "S", 1), (2, 2, "S", 1)],
+        )
+        self.assertEqual(game.best_scoring_move(), (0, 1, "O"))
+
+        game.make_move(0, 1, "O")
+        self.assertEqual(sorted(game.scoring_moves()), [(2, 0, "S", 1), (2, 2, "S", 1)])
+
+        game.unmake_move()
+        self.assertEqual(game.sos_count_at(0, 1, "O"), 2)
+
+    def test_scoring_moves_match_detection(self):
+        game = GeneralGame(board_size=5)
+        for row, col, letter in [(0, 0, "S"), (2, 2, "S"), (1, 3, "O"), (4, 4, "S")]:
+            game.make_move(row, col, letter)
+
+        expected = sorted(
+            (row, col, letter, len(game._detect_sos(row, col, letter)))
+            for row, col in game.legal_moves()
+            for letter in ("S", "O")
+            if game._detect_sos(row, col, letter)
+        )
+        self.assertEqual(sorted(game.scoring_moves()), expected)
+
+
+class TestPositionHashing(unittest.TestCase):
+    def test_transpositions_share_a_hash(self):
+        first = GeneralGame(board_size=4)
+        second = GeneralGame(board_size=4)
+        for row, col, letter in [(0, 0, "S"), (3, 3, "O"), (2, 1, "S")]:
+            first.make_move(row, col, letter)
+        for row, col, letter in [(2, 1, "S"), (3, 3, "O"), (0, 0, "S")]:
+            second.make_move(row, col, letter)
+        self.assertEqual(first.position_hash, second.position_hash)
+
+        simple = SimpleGame(board_size=4)
+        for row, col, letter in [(0, 0, "S"), (3, 3, "O"), (2, 1, "S")]:
+            simple.make_move(row, col, letter)
+        self.assertNotEqual(simple.position_hash, first.position_hash)
+        self.assertNotEqual(
+            GeneralGame(board_size=4).position_hash,
+            GeneralGame(board_size=5).position_hash,
+        )
+
+    def test_hash_tracks_side_to_move_and_unmake(self):
+        game = GeneralGame(board_size=3)
+        start = game.position_hash
+        game.make_move(0, 0, "S")
+        after_first = game.position_hash
+        game.make_move(0, 2, "S")
+        game.make_move(0, 1, "O")
+        # Scoring keeps the turn, so only the board part of the hash changes.
+        self.assertEqual(game.current_player, SOSGame.BLUE)
+
+        game.unmake_move()
+        game.unmake_move()
+        self.assertEqual(game.position_hash, after_first)
+        game.unmake_move()
+        self.assertEqual(game.position_hash, start)
+
+    def test_transposition_table_replacement(self):
+        table = TranspositionTable(size=4)
+        self.assertEqual(table.capacity, 4)
+        self.assertTrue(table.store(1, 5, 10, TranspositionTable.EXACT, (0, 0, "S")))
+        self.assertEqual(table.probe(1), (5, 10, TranspositionTable.EXACT, (0, 0, "S")))
+        self.assertIsNone(table.probe(2))
+
+        # Key 5 collides with key 1; a shallower result does not evict it.
+        self.assertFalse(table.store(5, 2, 3))
+        self.assertIn(1, table)
+        table.new_search()
+        self.assertTrue(table.store(5, 2, 3))
+        self.assertNotIn(1, table)
+
+        self.assertTrue(table.add(7))
+        self.assertFalse(table.add(7))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestBatchGame(unittest.TestCase):
+    def test_batch_matches_single_games(self):
+        moves = [(0, 0, "S"), (1, 0, "S"), (0, 1, "O"), (1, 1, "O"), (0, 2, "S")]
+        for mode, game_class in (
+            (SOSGame.SIMPLE, SimpleGame),
+            (SOSGame.GENERAL, GeneralGame),
+        ):
+            batch = BatchSOSGame(2, board_size=3, game_mode=mode)
+            game = game_class(board_size=3)
+            for row, col, letter in moves:
+                code = SOSGame.LETTER_CODES[letter]
+                # The second game always tries the occupied center instead.
+                applied = batch.make_moves([row, 1], [col, 1], [code, code])
+                self.assertEqual(applied[0], game.make_move(row, col, letter))
+
+            self.assertEqual(batch.blue_scores[0], game.blue_score)
+            self.assertEqual(batch.red_scores[0], game.red_score)
+            self.assertEqual(batch.game_over[0], game.game_over)
+            self.assertEqual(
+                batch.current_players[0], int(game.current_player == SOSGame.RED)
+            )
+            self.assertEqual(batch.empty_counts[1], 8)
+            self.assertEqual(batch.boards[0, 0, 1], SOSGame.LETTER_CODES["O"])
+        self.assertEqual(batch.winners[0], BatchSOSGame.NO_WINNER)
+
+    def test_play_random_finishes_all_games(self):
+        batch = BatchSOSGame(50, board_size=4, game_mode=SOSGame.GENERAL)
+        winners = batch.play_random(numpy.random.default_rng(0))
+        self.assertTrue(batch.all_over)
+        self.assertTrue((batch.empty_counts == 0).all())
+        blue_ahead = batch.blue_scores > batch.red_scores
+        self.assertTrue((winners[blue_ahead] == BatchSOSGame.BLUE).all())
+
+
+class TestSymmetry(unittest.TestCase):
+    MOVES = [(0, 0, "S"), (1, 2, "O"), (3, 1, "S"), (2, 2, "O")]
+
+    def test_symmetric_hashes_match_transformed_games(self):
+        game = GeneralGame(board_size=4)
+        for row, col, letter in self.MOVES:
+            game.make_move(row, col, letter)
+
+        for symmetry in range(SYMMETRY_COUNT):
+            image = GeneralGame(board_size=4)
+            for row, col, letter in self.MOVES:
+                image.make_move(*transform_cell(row, col, 4, symmetry), letter)
+            self.assertEqual(image.position_hash, game.symmetric_hashes[symmetry])
+            self.assertEqual(image.canonical_hash, game.canonical_hash)
+            self.assertEqual(image.canonical_form()[0], game.canonical_form()[0])
+        self.assertEqual(game.symmetric_hashes[0], game.position_hash)
+
+    def test_canonical_symmetry_and_inverse(self):
+        game = SimpleGame(board_size=5)
+        for row, col, letter in self.MOVES:
+            game.make_move(row, col, letter)
+        symmetry = game.canonical_symmetry
+        self.assertEqual(game.symmetric_hashes[symmetry], game.canonical_hash)
+
+        cells, form_symmetry = game.canonical_form()
+        row, col = transform_cell(3, 1, 5, form_symmetry)
+        self.assertEqual(cells[row * 5 + col], SOSGame.LETTER_CODES["S"])
+        for symmetry in range(SYMMETRY_COUNT):
+            inverse = SYMMETRY_INVERSES[symmetry]
+            image = transform_cell(1, 2, 5, symmetry)
+            self.assertEqual(transform_cell(*image, 5, inverse), (1, 2))
+
+    def test_symmetric_tables_built_on_demand(self):
+        SOSGame._SYMMETRIC_ZOBRIST_TABLES.pop(23, None)
+        game = GeneralGame(board_size=23)
+        game.make_move(0, 0, "S")
+        self.assertNotIn(23, SOSGame._SYMMETRIC_ZOBRIST_TABLES)
+        image = GeneralGame(board_size=23)
+        image.make_move(0, 22, "S")
+        self.assertEqual(image.canonical_hash, game.canonical_hash)
+        self.assertIn(23, SOSGame._SYMMETRIC_ZOBRIST_TABLES)
+
+    def test_unmake_restores_symmetric_hashes(self):
+        game = GeneralGame(board_size=4)
+        start = game.symmetric_hashes
+        game.make_move(1, 1, "S")
+        game.unmake_move()
+        self.assertEqual(game.symmetric_hashes, start)
+
+
+class TestCloneAndSerialization(unittest.TestCase):
+    def _play(self, game):
+        for row, col, letter in [(0, 0, "S"), (0, 2, "S"), (0, 1, "O"), (2, 2, "O")]:
+            game.make_move(row, col, letter)
+        return game
+
+    def _state(self, game):
+        return (
+            type(game),
+            game.board_backend,
+            [game.get_cell(row, col) for row in range(4) for col in range(4)],
+            game.current_player,
+            game.blue_score,
+            game.red_score,
+            game.game_over,
+            game.winner,
+            game.position_hash,
+            game.symmetric_hashes,
+            sorted(game.legal_moves()),
+            sorted(game.scoring_moves()),
+        )
+
+    def test_game_has_no_instance_dict(self):
+        game = GeneralGame(board_size=4)
+        with self.assertRaises(AttributeError):
+            game.extra = 1
+
+    def test_clone_is_independent(self):
+        game = self._play(GeneralGame(board_size=4))
+        copy = game.clone()
+        self.assertEqual(self._state(copy), self._state(game))
+
+        copy.make_move(3, 3, "S")
+        self.assertEqual(game.get_cell(3, 3), SOSGame.EMPTY)
+        self.assertEqual(game.empty_count, copy.empty_count + 1)
+        self.assertTrue(copy.unmake_move())
+        self.assertFalse(copy.unmake_move())
+        self.assertEqual(self._state(copy), self._state(game))
+
+    def test_bytes_and_pickle_round_trip(self):
+        for game in (
+            self._play(GeneralGame(board_size=4)),
+            self._play(SimpleGame(board_size=4, board_backend=SOSGame.ARRAY_BOARD)),
+        ):
+            data = game.to_bytes()
+            self.assertLess(len(data), 64)
+            restored = SOSGame.from_bytes(data)
+            self.assertEqual(self._state(restored), self._state(game))
+            self.assertEqual(
+                self._state(pickle.loads(pickle.dumps(game))), self._state(game)
+            )
+
+        with self.assertRaises(ValueError):
+            SOSGame.from_bytes(b"XX" + data[2:])
+
+
+class TestSparseBoard(unittest.TestCase):
+    MOVES = [(0, 0, "S"), (1, 0, "S"), (0, 1, "O"), (1, 1, "O"), (0, 2, "S")]
+
+    def test_sparse_matches_dense_rules(self):
+        for game_class in (SimpleGame, GeneralGame):
+            dense = game_class(board_size=4)
+            sparse = game_class(board_size=4, board_backend=SOSGame.SPARSE_BOARD)
+            for row, col, letter in self.MOVES:
+                self.assertEqual(
+                    sparse.make_move(row, col, letter),
+                    dense.make_move(row, col, letter),
+                )
+            self.assertEqual(sparse.sos_lines, dense.sos_lines)
+            self.assertEqual(sparse.game_over, dense.game_over)
+            self.assertEqual(sparse.position_hash, dense.position_hash)
+            self.assertEqual(sparse.canonical_hash, dense.canonical_hash)
+            self.assertEqual(sorted(sparse.legal_moves()), sorted(dense.legal_moves()))
+            self.assertEqual(
+                sorted(sparse.scoring_moves()), sorted(dense.scoring_moves())
+            )
+
+    def test_huge_board_stores_only_moves(self):
+        game = GeneralGame(board_size=100000, board_backend=SOSGame.SPARSE_BOARD)
+        self.assertEqual(game.empty_count, 100000 * 100000)
+        for row, col, letter in [(500, 500, "S"), (500, 502, "S"), (500, 501, "O")]:
+            game.make_move(row, col, letter)
+        self.assertEqual(game.blue_score, 2)
+        self.assertEqual(len(game._cells), 3)
+        self.assertEqual(game.get_cell(99999, 99999), SOSGame.EMPTY)
+
+        row, col = game.random_empty_cell()
+        self.assertEqual(game.get_cell(row, col), SOSGame.EMPTY)
+
+        restored = SOSGame.from_bytes(game.to_bytes())
+        self.assertEqual(restored.position_hash, game.position_hash)
+        self.assertEqual(restored.get_cell(500, 501), "O")
+
+        game.unmake_move()
+        self.assertEqual(len(game._cells), 2)
+        self.assertEqual(game.blue_score, 0)
+        with self.assertRaises(ValueError):
+            game.canonical_form()
+
+
+class TestSearchPlayer(unittest.TestCase):
+    def test_takes_winning_move(self):
+        game = SimpleGame(board_size=4)
+        game.make_move(0, 0, "S")
+        game.make_move(3, 3, "O")
+        game.make_move(0, 2, "S")
+        game.make_move(3, 0, "O")
+        player = SearchPlayer("blue", time_limit=1.0, max_depth=2)
+        self.assertEqual(player.get_move(game), (0, 1, "O"))
+
+    def test_does_not_hand_over_a_win(self):
+        # Red must not put an S or O next to blue's lone S where blue can
+        # finish it; every other reply keeps the game going.
+        game = SimpleGame(board_size=5)
+        game.make_move(2, 2, "S")
+        player = SearchPlayer("red", time_limit=1.0, max_depth=2)
+        row, col, letter = player.get_move(game)
+        game.make_move(row, col, letter)
+        self.assertEqual(game.scoring_moves(), [])
+        self.assertEqual(player.last_search["depth"], 2)
+
+    def test_general_mode_chains_extra_turns(self):
+        # Red can score with an O on every edge cell, keeping the turn each
+        # time, so the search should value the position at more than one SOS.
+        game = GeneralGame(board_size=3)
+        for row, col, letter in [(0, 0, "S"), (1, 1, "S"), (0, 2, "S"), (2, 0, "S")]:
+            game.make_move(row, col, letter)
+        game.make_move(2, 2, "S")
+        player = SearchPlayer(game.current_player, time_limit=1.0, max_depth=3)
+        move = player.get_move(game)
+        self.assertIn(move, [(0, 1, "O"), (1, 0, "O"), (2, 1, "O"), (1, 2, "O")])
+        self.assertGreaterEqual(player.last_search["value"], 2)
+
+    def test_long_scoring_chain_on_large_board(self):
+        # A quarter filled 30x30 board holds over a hundred scoring moves,
+        # a cash-in chain deeper than the recursion limit allows.
+        game = GeneralGame(board_size=30)
+        rng = random.Random(4)
+        cells = [(row, col) for row in range(30) for col in range(30)]
+        rng.shuffle(cells)
+        for row, col in cells[:225]:
+            game.make_move(row, col, rng.choice("SO"))
+        self.assertGreater(len(game.scoring_moves()), 100)
+        player = SearchPlayer(game.current_player, time_limit=0.3, max_depth=2)
+        started = time.perf_counter()
+        move = player.get_move(game)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertIsNotNone(move)
+        self.assertTrue(game.make_move(*move))
+
+    def test_quiescence_restores_position(self):
+        game = GeneralGame(board_size=3)
+        for row, col, letter in [(0, 0, "S"), (1, 1, "S"), (0, 2, "S"), (2, 0, "S")]:
+            game.make_move(row, col, letter)
+        game.make_move(2, 2, "S")
+        key = game.position_hash
+        player = SearchPlayer(game.current_player)
+        player._deadline = time.perf_counter() + 10
+        player._nodes = 0
+        # Red cashes in an O on each of the four edges, each counted from
+        # both ends of its line.
+        self.assertEqual(player._quiesce(game, 0), 8)
+        self.assertEqual(game.position_hash, key)
+
+
+class TestMCTSPlayer(unittest.TestCase):
+    def test_takes_winning_move(self):
+        game = SimpleGame(board_size=4)
+        game.make_move(0, 0, "S")
+        game.make_move(3, 3, "O")
+        game.make_move(0, 2, "S")
+        game.make_move(3, 0, "O")
+        player = MCTSPlayer("blue", playouts=50)
+        self.assertEqual(player.get_move(game), (0, 1, "O"))
+
+    def test_does_not_hand_over_a_win(self):
+        game = SimpleGame(board_size=4)
+        game.make_move(1, 1, "S")
+        player = MCTSPlayer("red", playouts=1500)
+        row, col, letter = player.get_move(game)
+        game.make_move(row, col, letter)
+        self.assertEqual(game.scoring_moves(), [])
+        self.assertTrue(player.last_stats)
+
+    def test_search_tree_counts_playouts(self):
+        game = GeneralGame(board_size=3)
+        stats = search_tree(game.to_bytes(), 200, None, 1.4, RANDOM_ROLLOUT, 1)
+        self.assertEqual(sum(visits for visits, _ in stats.values()), 200)
+        self.assertEqual(len(stats), 18)
+        self.assertEqual(game.empty_count, 9)
+
+    def test_root_parallel_merges_worker_trees(self):
+        game = GeneralGame(board_size=3)
+        player = MCTSPlayer("blue", playouts=60, workers=2)
+        try:
+            move = player.get_move(game)
+        finally:
+            player.close()
+        self.assertIn(move, player.last_stats)
+        total = sum(visits for visits, _ in player.last_stats.values())
+        self.assertEqual(total, 120)
+
+    def test_time_only_search(self):
+        with self.assertRaises(ValueError):
+            MCTSPlayer("blue", playouts=None)
+        game = GeneralGame(board_size=10)
+        player = MCTSPlayer("blue", playouts=None, time_limit=0.2)
+        started = time.perf_counter()
+        player.get_move(game)
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertTrue(player.last_stats)
+
+
+class TestPoisonedCells(unittest.TestCase):
+    def test_classifies_moves_around_letters(self):
+        game = GeneralGame(board_size=5)
+        game.make_move(2, 2, "S")
+        poisoned = PoisonedCells()
+        poisoned.update(game)
+        # An O next to the S lets the opponent finish with an S beyond it,
+        # and an S two away lets them put an O in between.
+        self.assertEqual(poisoned.gift(2, 3, "O"), 1)
+        self.assertEqual(poisoned.gift(2, 4, "S"), 2)
+        self.assertEqual(poisoned.gift(2, 3, "S"), 0)
+        self.assertTrue(poisoned.is_safe(0, 1, "O"))
+        self.assertEqual(len(poisoned.poisoned), 16)
+
+    def test_follows_moves_and_undo(self):
+        game = GeneralGame(board_size=5)
+        poisoned = PoisonedCells()
+        game.make_move(2, 2, "S")
+        poisoned.update(game)
+        game.make_move(2, 3, "O")
+        poisoned.update(game)
+        self.assertEqual(poisoned.gift(2, 3, "O"), 0)
+        # An S two cells left of the S leaves a gap the opponent fills with O.
+        self.assertEqual(poisoned.gift(2, 1, "S"), 0)
+        self.assertEqual(poisoned.gift(2, 0, "S"), 2)
+        game.unmake_move()
+        poisoned.update(game)
+        self.assertEqual(poisoned.gift(2, 3, "O"), 1)
+
+    def test_remade_moves_after_undo(self):
+        game = GeneralGame(board_size=5)
+        poisoned = PoisonedCells()
+        for row, col, letter in ((2, 2, "S"), (0, 0, "O"), (4, 4, "O")):
+            game.make_move(row, col, letter)
+        poisoned.update(game)
+        game.unmake_move()
+        game.unmake_move()
+        # The last move is made again, so only the middle one differs.
+        game.make_move(2, 3, "O")
+        game.make_move(4, 4, "O")
+        poisoned.update(game)
+        fresh = PoisonedCells()
+        fresh.update(game)
+        self.assertEqual(poisoned.poisoned, fresh.poisoned)
+        self.assertEqual(poisoned.gift(2, 4, "S"), 0)
+
+    def test_heuristic_player_avoids_gifts(self):
+        game = SimpleGame(board_size=4)
+        game.make_move(1, 1, "S")
+        player = HeuristicPlayer("red")
+        for _ in range(20):
+            row, col, letter = player.get_move(game)
+            game.make_move(row, col, letter)
+            self.assertEqual(game.scoring_moves(), [])
+            game.unmake_move()
+
+
+class TestSolver(unittest.TestCase):
+    def test_small_boards_are_draws(self):
+        self.assertEqual(Solver().value(SimpleGame(board_size=3)), 0)
+        self.assertEqual(Solver().value(GeneralGame(board_size=3)), 0)
+
+    def test_values_are_from_side_to_move(self):
+        game = GeneralGame(board_size=3)
+        for row, col, letter in [(0, 0, "S"), (0, 2, "S"), (2, 0, "S"), (2, 2, "S")]:
+            game.make_move(row, col, letter)
+        game.make_move(1, 1, "S")
+        # Red's O on any edge cell scores twice and keeps the turn; all four
+        # edge O's score 8 between them.
+        self.assertEqual(game.current_player, "red")
+        move, value = Solver().best_move(game)
+        self.assertEqual(move[2], "O")
+        self.assertEqual(value, 8)
+
+    def test_mirrored_positions_share_a_value(self):
+        solver = Solver()
+        game = SimpleGame(board_size=3)
+        game.make_move(0, 0, "S")
+        solver.value(game)
+        mirrored = SimpleGame(board_size=3)
+        mirrored.make_move(2, 2, "S")
+        self.assertEqual(solver.lookup(mirrored), solver.lookup(game))
+
+    def test_table_round_trip_and_player_lookups(self):
+        solver = Solver()
+        game = SimpleGame(board_size=3)
+        value = solver.value(game)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "simple3.sos")
+            solver.save(path)
+            table = SolutionTable(path)
+            try:
+                self.assertEqual(len(table), solver.solved)
+                self.assertEqual(table.get(solution_key(game)), value)
+            finally:
+                table.close()
+
+            player = SolverPlayer("blue", table_path=path, endgame_cells=0)
+            try:
+                while not game.game_over:
+                    game.make_move(*player.get_move(game))
+                self.assertEqual(player.solver.solved, 0)
+            finally:
+                player.solver.table.close()
+        self.assertIsNone(game.winner)
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.sos")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_self_play_book_lookup(self):
+        stats = self_play_stats(SimpleGame, 4, HeuristicPlayer, 20, depth=2)
+        OpeningBook.write(self.path, stats, depth=2)
+        book = OpeningBook(self.path)
+        try:
+            self.assertEqual(len(book), len(stats))
+            game = SimpleGame(board_size=4)
+            self.assertEqual(sum(games for *_, games, _ in book.moves(game)), 20)
+            player = ComputerPlayer("blue", book=book)
+            move = player.get_move(game)
+            self.assertIn(move, [move[:3] for move in book.moves(game)])
+            game.make_move(*move)
+            game.make_move(*player.get_move(game))
+            # Past the book's depth nothing is looked up.
+            self.assertIsNone(book.lookup(game))
+        finally:
+            book.close()
+
+    def test_every_computer_player_takes_a_book(self):
+        stats = self_play_stats(SimpleGame, 4, HeuristicPlayer, 10, depth=1)
+        OpeningBook.write(self.path, stats, depth=1)
+        game = SimpleGame(board_size=4)
+        players = [
+            make_player(f"heuristic:book={self.path!r}", "blue"),
+            make_player(f"search:book={self.path!r}", "blue"),
+            make_player(f"mcts:book={self.path!r}", "blue"),
+            make_player(f"solver:book={self.path!r}", "blue"),
+        ]
+        try:
+            for player in players:
+                move = player.get_move(game)
+                self.assertIn(move, [move[:3] for move in player.book.moves(game)])
+        finally:
+            for player in players:
+                player.book.close()
+
+    def test_moves_follow_board_symmetry(self):
+        game = SimpleGame(board_size=5)
+        game.make_move(0, 1, "S")
+        game.make_move(1, 3, "O")
+        symmetry = game.canonical_symmetry
+        row, col = transform_cell(0, 3, 5, symmetry)
+        stats = {(game.canonical_hash, row, col, 2): (3, 6)}
+        OpeningBook.write(self.path, stats, depth=4)
+        book = OpeningBook(self.path, min_games=3)
+        try:
+            self.assertEqual(book.lookup(game), (0, 3, "O"))
+            # The same position rotated a quarter turn gets the rotated move.
+            rotated = SimpleGame(board_size=5)
+            rotated.make_move(*transform_cell(0, 1, 5, 1), "S")
+            rotated.make_move(*transform_cell(1, 3, 5, 1), "O")
+            self.assertEqual(book.lookup(rotated), (*transform_cell(0, 3, 5, 1), "O"))
+        finally:
+            book.close()
+
+    def test_min_games_filters_rare_moves(self):
+        game = GeneralGame(board_size=4)
+        stats = {(game.canonical_hash, 0, 0, 1): (1, 2)}
+        OpeningBook.write(self.path, stats, depth=1)
+        book = OpeningBook(self.path, min_games=2)
+        try:
+            self.assertIsNone(book.lookup(game))
+        finally:
+            book.close()
+
+
+class TestPondering(unittest.TestCase):
+    def _position(self):
+        # Red to move on a 4x4 board; only an O at (2, 0) keeps red from losing.
+        game = SimpleGame(board_size=4)
+        for move in [
+            (2, 3, "S"),
+            (3, 3, "O"),
+            (0, 1, "O"),
+            (0, 2, "S"),
+            (3, 1, "O"),
+            (2, 1, "O"),
+            (1, 3, "S"),
+            (2, 2, "O"),
+            (3, 0, "O"),
+            (3, 2, "O"),
+            (0, 3, "S"),
+            (1, 0, "S"),
+            (0, 0, "O"),
+        ]:
+            game.make_move(*move)
+        return game
+
+    def test_answers_from_ponder_search_on_a_hit(self):
+        game = self._position()
+        player = SearchPlayer("blue", time_limit=5.0)
+        player.ponder(game)
+        self.assertTrue(player.pondering)
+        time.sleep(0.2)
+        game.make_move(2, 0, "O")
+        started = time.perf_counter()
+        move = player.get_move(game)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertFalse(player.pondering)
+        self.assertEqual(player.ponder_hits, 1)
+        self.assertEqual(game.get_cell(move[0], move[1]), SOSGame.EMPTY)
+
+    def test_miss_falls_back_to_a_normal_search(self):
+        game = self._position()
+        player = SearchPlayer("blue", time_limit=0.2)
+        player.ponder(game)
+        game.make_move(1, 1, "S")
+        # Blue can now score with an O at (1, 2).
+        self.assertEqual(player.get_move(game), (1, 2, "O"))
+        self.assertEqual(player.ponder_hits, 0)
+
+    def test_stop_pondering(self):
+        player = SearchPlayer("red", time_limit=1.0)
+        game = GeneralGame(board_size=5)
+        game.make_move(2, 2, "S")
+        player.ponder(game)
+        player.stop_pondering()
+        self.assertFalse(player.pondering)
+        player.stop_pondering()
+
+
+class TestTournament(unittest.TestCase):
+    def test_make_player_from_spec(self):
+        player = make_player("search:time_limit=0.05,max_depth=2", "red")
+        self.assertIsInstance(player, SearchPlayer)
+        self.assertEqual(player.time_limit, 0.05)
+        self.assertEqual(player.color, "red")
+        self.assertIsInstance(make_player("player.HeuristicPlayer", "blue"), Player)
+        with self.assertRaises(ValueError):
+            make_player("nobody", "blue")
+
+    def test_schedule_swaps_colors(self):
+        jobs = schedule(["a", "b", "c"], [3, 4], [SOSGame.SIMPLE], games=2, seed=1)
+        self.assertEqual(len(jobs), 3 * 2 * 2)
+        self.assertEqual(jobs[0][:2], ("a", "b"))
+        self.assertEqual(jobs[1][:2], ("b", "a"))
+
+    def test_play_game_result(self):
+        result = play_game(("heuristic", "computer", 4, SOSGame.GENERAL, 7))
+        self.assertEqual(result["moves"], 16)
+        self.assertIsNone(result["forfeit"])
+        self.assertIn(result["winner"], ("blue", "red", None))
+        again = play_game(("heuristic", "computer", 4, SOSGame.GENERAL, 7))
+        del result["seconds"], again["seconds"]
+        self.assertEqual(result, again)
+
+    def test_illegal_move_forfeits(self):
+        result = play_game(("player.HumanPlayer", "computer", 3, SOSGame.SIMPLE, 1))
+        self.assertEqual(result["forfeit"], "blue")
+        self.assertEqual(result["winner"], "red")
+
+    def test_elo_orders_players(self):
+        results = []
+        for i in range(40):
+            winner = "blue" if i % 4 else "red"
+            results.append({"blue": "strong", "red": "weak", "winner": winner})
+        ratings = elo_with_intervals(results, samples=50)
+        strong, low, high = ratings["strong"]
+        self.assertGreater(strong, ratings["weak"][0])
+        self.assertAlmostEqual(strong + ratings["weak"][0], 3000.0)
+        self.assertLessEqual(low, strong)
+        self.assertGreaterEqual(high, strong)
+
+    def test_run_jobs_streams_results(self):
+        jobs = schedule(["computer", "heuristic"], [3], [SOSGame.SIMPLE], games=4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.jsonl")
+            with open(path, "w") as output:
+                results = list(run_jobs(jobs, 2, output))
+            self.assertEqual(len(load_results(path)), 4)
+        self.assertEqual(len(results), 4)
+        self.assertIn("4 games", format_report(results, seconds=1.0))
+
+    def test_players_with_worker_processes(self):
+        jobs = schedule(
+            ["mcts:workers=2,playouts=20", "computer"], [3], [SOSGame.SIMPLE], games=2
+        )
+        results = list(run_jobs(jobs, 2))
+        self.assertEqual([result["error"] for result in results], [None, None])
+
+    def test_errors_are_not_rated(self):
+        results = [
+            {"blue": "a", "red": "b", "winner": "blue", "forfeit": None},
+            {"blue": "b", "red": "a", "winner": "red", "forfeit": None},
+        ]
+        ratings = elo_with_intervals(results, samples=10)
+        errored = (
+            results
+            + [
+                {
+                    "blue": "a",
+                    "red": "b",
+                    "winner": "red",
+                    "forfeit": "blue",
+                    "error": "RuntimeError: boom",
+                }
+            ]
+            * 5
+        )
+        self.assertEqual(elo_with_intervals(errored, samples=10), ratings)
+        report = format_report(errored)
+        self.assertIn("5 errors not rated", report)
+        self.assertIn("a: 5 games lost to errors", report)
+
+    def test_report_with_no_rated_games(self):
+        results = [
+            {
+                "blue": "a",
+                "red": "b",
+                "winner": "red",
+                "forfeit": "blue",
+                "error": "RuntimeError: boom",
+            }
+        ]
+        self.assertEqual(fit_elo(results), {})
+        self.assertEqual(elo_with_intervals(results, samples=10), {})
+        report = format_report(results)
+        self.assertTrue(report.startswith("1 games, 1 forfeits, 1 errors not rated"))
+        self.assertNotIn("elo", report)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def _metric(self, value, unit="moves/s", higher=True, timed=True):
+        return {
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher,
+            "timed": timed,
+        }
+
+    def test_find_regressions(self):
+        baseline = {
+            "calibration": self._metric(100.0, "loops/s"),
+            "moves": self._metric(1000.0),
+            "memory": self._metric(500, "bytes", higher=False, timed=False),
+            "latency": self._metric(0.01, "s", higher=False),
+        }
+        results = {
+            "calibration": self._metric(100.0, "loops/s"),
+            "moves": self._metric(400.0),
+            "memory": self._metric(1000, "bytes", higher=False, timed=False),
+            "latency": self._metric(0.011, "s", higher=False),
+            "new_metric": self._metric(1.0),
+        }
+        regressions = find_regressions(results, baseline, tolerance=0.5)
+        self.assertEqual(
+            [line.split(":")[0] for line in regressions], ["memory", "moves"]
+        )
+
+    def test_calibration_scales_timed_metrics(self):
+        baseline = {
+            "calibration": self._metric(200.0, "loops/s"),
+            "moves": self._metric(1000.0),
+            "memory": self._metric(500, "bytes", higher=False, timed=False),
+        }
+        # Half the machine speed explains half the moves, but not more memory.
+        results = {
+            "calibration": self._metric(100.0, "loops/s"),
+            "moves": self._metric(500.0),
+            "memory": self._metric(800, "bytes", higher=False, timed=False),
+        }
+        regressions = find_regressions(results, baseline, tolerance=0.25)
+        self.assertEqual([line.split(":")[0] for line in regressions], ["memory"])
+
+    def test_run_benchmarks_emits_json_metrics(self):
+        results = run_benchmarks(["replay"], quick=True, repeat=1)
+        self.assertEqual(
+            set(results),
+            {"calibration", "replay.moves_per_second", "replay.games_per_second"},
+        )
+        self.assertGreater(results["replay.moves_per_second"]["value"], 0)
+        json.dumps(results)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.disable)
+        self.addCleanup(instrumentation.reset)
+
+    def test_counts_moves_and_sos(self):
+        game = SimpleGame(board_size=3)
+        with instrumentation.instrumented():
+            game.make_move(0, 0, "S")
+            game.make_move(0, 1, "O")
+            game.make_move(0, 1, "S")
+            game.make_move(0, 2, "S")
+        counters = instrumentation.snapshot()["counters"]
+        self.assertEqual(counters["moves"], 3)
+        self.assertEqual(counters["sos_found"], 1)
+
+    def test_disable_restores_methods(self):
+        make_move = SimpleGame.__dict__["make_move"]
+        get_move = ComputerPlayer.__dict__["get_move"]
+        instrumentation.enable()
+        self.assertTrue(instrumentation.is_enabled())
+        self.assertIsNot(SimpleGame.__dict__["make_move"], make_move)
+        instrumentation.disable()
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertIs(SimpleGame.__dict__["make_move"], make_move)
+        self.assertIs(ComputerPlayer.__dict__["get_move"], get_move)
+        # Nothing is recorded once disabled.
+        SimpleGame(board_size=3).make_move(0, 0, "S")
+        self.assertEqual(instrumentation.snapshot()["counters"], {})
+
+    def test_timings_per_call_site(self):
+        random.seed(1)
+        game = GeneralGame(board_size=4)
+        player = ComputerPlayer(SOSGame.BLUE)
+        with instrumentation.instrumented():
+            game.make_move(*player.get_move(game))
+        timings = instrumentation.snapshot()["timings"]
+        self.assertEqual(timings["ComputerPlayer.get_move"]["calls"], 1)
+        self.assertEqual(timings["GeneralGame.make_move"]["calls"], 1)
+        site = timings["GeneralGame.make_move"]
+        self.assertEqual(sum(site["histogram"].values()), 1)
+        self.assertLessEqual(site["min_seconds"], site["max_seconds"])
+
+    def test_capture_game(self):
+        random.seed(1)
+        game, report = instrumentation.capture_game(
+            SimpleGame(board_size=3),
+            ComputerPlayer(SOSGame.BLUE),
+            ComputerPlayer(SOSGame.RED),
+            top=5,
+        )
+        self.assertTrue(game.game_over)
+        self.assertIn("cumulative", report["profile"])
+        self.assertGreater(report["memory"]["peak_bytes"], 0)
+        self.assertEqual(
+            report["instrumentation"]["counters"]["moves"], len(game.move_history)
+        )
+        self.assertFalse(instrumentation.is_enabled())
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestEvaluator(unittest.TestCase):
+    def _random_game(self, seed, board_size=6, board_backend=SOSGame.LIST_BOARD):
+        rng = random.Random(seed)
+        game = GeneralGame(board_size=board_size, board_backend=board_backend)
+        for _ in range(board_size * board_size // 2):
+            row, col = game.random_empty_cell(rng)
+            game.make_move(row, col, rng.choice("SO"))
+        return game
+
+    def test_board_array(self):
+        game = GeneralGame(board_size=3, board_backend=SOSGame.SPARSE_BOARD)
+        game.make_move(0, 1, "S")
+        game.make_move(2, 2, "O")
+        board = board_array(game)
+        self.assertEqual(board.shape, (3, 3))
+        self.assertEqual(board[0, 1], 1)
+        self.assertEqual(board[2, 2], 2)
+        self.assertEqual(int(board.sum()), 3)
+
+    def test_threats_match_engine(self):
+        for backend in SOSGame.BOARD_BACKENDS:
+            game = self._random_game(3, board_backend=backend)
+            features = evaluate_game(game)
+            for row, col in game.legal_moves():
+                self.assertEqual(
+                    features["s_threats"][row, col], game.sos_count_at(row, col, "S")
+                )
+                self.assertEqual(
+                    features["o_threats"][row, col], game.sos_count_at(row, col, "O")
+                )
+            self.assertEqual(features["threats"], len(game.scoring_moves()))
+
+    def test_gifts_match_poisoned_cells(self):
+        game = self._random_game(5)
+        poisoned = PoisonedCells()
+        poisoned.update(game)
+        features = evaluate_game(game)
+        for row, col in game.legal_moves():
+            self.assertEqual(
+                features["s_gifts"][row, col], poisoned.gift(row, col, "S")
+            )
+            self.assertEqual(
+                features["o_gifts"][row, col], poisoned.gift(row, col, "O")
+            )
+        self.assertEqual(features["poisoned"], len(poisoned.poisoned))
+
+    def test_completed_sos_and_occupied_cells(self):
+        game = GeneralGame(board_size=3)
+        game.make_move(1, 0, "S")
+        game.make_move(1, 2, "S")
+        game.make_move(1, 1, "O")
+        features = evaluate_game(game)
+        self.assertEqual(features["sos"], 1)
+        self.assertEqual(features["o_threats"][1, 1], 0)
+
+    def test_batch_matches_single_boards(self):
+        games = [self._random_game(seed) for seed in range(4)]
+        batch = evaluate(boards_array(games))
+        for i, game in enumerate(games):
+            single = evaluate_game(game)
+            for name, values in single.items():
+                self.assertTrue(numpy.array_equal(batch[name][i], values), name)
+
+
+# Stand-in for the LM Studio chat completions endpoint. Replies with the
+# queued contents in order, repeating the last one, or with what replies
+# returns for the request body if it is a function. A (content, delay)
+# reply is sent after the delay, or streamed with the delay before each
+# event. Records the request bodies and how many connections were opened.
+class FakeLLMServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    # model is the model id replies report, as servers name the model they
+    # loaded whatever model was asked for. Without chunked, streams are
+    # sent unframed and end by closing the connection.
+    def __init__(self, replies, model="fake-model", chunked=True):
+        super().__init__(("127.0.0.1", 0), FakeLLMHandler)
+        self.replies = list(replies)
+        self.model = model
+        self.chunked = chunked
+        self.requests = []
+        self.connections = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+    def next_reply(self, body):
+        with self.lock:
+            self.requests.append(body)
+            if callable(self.replies):
+                return self.replies(body)
+            if len(self.replies) > 1:
+                return self.replies.pop(0)
+            return self.replies[0]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeLLMHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        content = self.server.next_reply(body)
+        delay = 0.0
+        if isinstance(content, tuple):
+            content, delay = content
+        if body.get("stream"):
+            self._stream(content, delay)
+            return
+        time.sleep(delay)
+        data = json.dumps(
+            {"model": self.server.model, "choices": [{"message": {"content": content}}]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Send the reply as server-sent events two characters at a time, each
+    # after the delay. Counts replies the client stopped reading early.
+    def _stream(self, content, delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        if self.server.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        events = [
+            {
+                "model": self.server.model,
+                "choices": [{"delta": {"content": content[i : i + 2]}}],
+            }
+            for i in range(0, len(content), 2)
+        ]
+        try:
+            for event in events:
+                time.sleep(delay)
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            with self.server.lock:
+                self.server.dropped += 1
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        if self.server.chunked:
+            data = f"{len(data):x}\r\n".encode() + data + b"\r\n"
+        self.wfile.write(data)
+        self.wfile.flush()
+
+
+# Server that answers every connection with the same raw bytes and then
+# closes it, for replies too broken for FakeLLMServer to send.
+class RawReplyServer:
+    def __init__(self, reply):
+        self.reply = reply
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.socket.getsockname()[1]}/v1/chat/completions"
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                return
+            with connection:
+                connection.recv(65536)
+                connection.sendall(self.reply)
+
+    def stop(self):
+        self.socket.close()
+
+
+# Tests of LLM players against a FakeLLMServer started with REPLIES.
+# _player() builds a PLAYER_CLASS player, without a cache unless given one,
+# talking to that server.
+class LLMServerTestCase(unittest.TestCase):
+    PLAYER_CLASS = LLMPlayer
+    REPLIES = ["1,1,S"]
+
+    def setUp(self):
+        self.server = FakeLLMServer(self.REPLIES)
+        self.addCleanup(self.server.stop)
+
+    def _player(self, color=SOSGame.BLUE, player_class=None, cache=False, **kwargs):
+        player_class = player_class or self.PLAYER_CLASS
+        player = player_class(color, cache=cache, **kwargs)
+        player.api_url = self.server.url
+        return player
+
+
+class TestLLMPlayer(LLMServerTestCase):
+    def test_sessions_are_shared(self):
+        self.assertIs(LLMPlayer("blue").session, LLMPlayer("red").session)
+        self.assertIs(LLMPlayer("blue", pool_size=2).session, shared_session(2))
+        self.assertIsNot(shared_session(2), shared_session(3))
+        adapter = shared_session(3).get_adapter("http://localhost:1234/")
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_connections_are_reused(self):
+        game = GeneralGame(board_size=3)
+        # Streamed replies cut short drop their connection, so read whole
+        # replies here.
+        blue = self._player(SOSGame.BLUE, pool_size=1, stream=False)
+        red = self._player(SOSGame.RED, pool_size=1, stream=False)
+        self.server.replies = ["0,0,S", "0,1,S", "2,2,O"]
+        for player in (blue, red, blue):
+            game.make_move(*player.get_move(game))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_invalid_replies(self):
+        game = GeneralGame(board_size=3)
+        game.make_move(1, 1, "O")
+        self.server.replies = ["no idea", "1,1,S", "2,0,O"]
+        self.assertEqual(self._player().get_move(game), (2, 0, "O"))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertIn("ERROR", self.server.requests[-1]["messages"][1]["content"])
+
+
+class TestAsyncLLMPlayer(LLMServerTestCase):
+    PLAYER_CLASS = AsyncLLMPlayer
+
+    def test_candidates_use_different_temperatures(self):
+        move = self._player().get_move(GeneralGame(board_size=3))
+        self.assertEqual(move, (1, 1, "S"))
+        self.assertEqual(
+            sorted(body["temperature"] for body in self.server.requests),
+            [0.0, 0.4, 0.8],
+        )
+
+    def test_first_valid_reply_wins(self):
+        game = GeneralGame(board_size=3)
+        game.make_move(1, 1, "O")
+        replies = {0.0: ("1,1,S", 0.0), 0.4: ("0,2,O", 0.1), 0.8: ("2,2,S", 5.0)}
+        self.server.replies = lambda body: replies[body["temperature"]]
+        started = time.perf_counter()
+        move = self._player().get_move(game)
+        # The invalid fast reply is skipped and the slow one is not awaited.
+        self.assertEqual(move, (0, 2, "O"))
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+    def test_no_valid_reply(self):
+        self.server.replies = ["pass"]
+        with self.assertRaises(RuntimeError):
+            self._player(candidates=2, fallback=None).get_move(
+                GeneralGame(board_size=3)
+            )
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_move_budget(self):
+        self.server.replies = [("1,1,S", 5.0)]
+        started = time.perf_counter()
+        game = GeneralGame(board_size=3)
+        move = self._player(move_budget=0.2).get_move(game)
+        self.assertTrue(game.make_move(*move))
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+
+class TestLLMMoveCache(LLMServerTestCase):
+    REPLIES = ["0,1,S"]
+
+    def test_repeated_position_skips_server(self):
+        cache = MoveCache()
+        player = self._player(cache=cache)
+        self.assertEqual(player.get_move(GeneralGame(board_size=3)), (0, 1, "S"))
+        self.assertEqual(player.get_move(GeneralGame(board_size=3)), (0, 1, "S"))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(cache.stats["hits"], 1)
+        # The cache is not read before a reply named the served model.
+        self.assertEqual(cache.stats["misses"], 0)
+
+    def test_keyed_on_served_model(self):
+        cache = MoveCache()
+        player = self._player(cache=cache)
+        self.assertEqual(player.get_move(GeneralGame(board_size=3)), (0, 1, "S"))
+        self.assertEqual(player.model_id, "fake-model")
+        self.assertEqual(
+            cache.get(GeneralGame(board_size=3), SOSGame.BLUE, "fake-model"),
+            (0, 1, "S"),
+        )
+        # Another model loaded under the same requested name misses.
+        self.server.model = "other-model"
+        self.server.replies = ["0,0,S"]
+        player = self._player(cache=cache)
+        self.assertEqual(player.get_move(GeneralGame(board_size=3)), (0, 0, "S"))
+        self.assertEqual(player.model_id, "other-model")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_key_includes_color_mode_and_model(self):
+        cache = MoveCache()
+        cache.put(GeneralGame(board_size=3), SOSGame.BLUE, "a", (0, 1, "S"))
+        self.assertIsNone(cache.get(GeneralGame(board_size=3), SOSGame.RED, "a"))
+        self.assertIsNone(cache.get(SimpleGame(board_size=3), SOSGame.BLUE, "a"))
+        self.assertIsNone(cache.get(GeneralGame(board_size=3), SOSGame.BLUE, "b"))
+        self.assertEqual(
+            cache.get(GeneralGame(board_size=3), SOSGame.BLUE, "a"), (0, 1, "S")
+        )
+
+    def test_symmetric_positions_share_entries(self):
+        cache = MoveCache()
+        game = GeneralGame(board_size=4)
+        game.make_move(0, 0, "S")
+        game.make_move(0, 1, "O")
+        cache.put(game, SOSGame.BLUE, "m", (2, 1, "O"))
+        # The same position mirrored left to right.
+        mirrored = GeneralGame(board_size=4)
+        mirrored.make_move(0, 3, "S")
+        mirrored.make_move(0, 2, "O")
+        self.assertEqual(cache.get(mirrored, SOSGame.BLUE, "m"), (2, 2, "O"))
+
+    def test_least_recently_used_evicted(self):
+        cache = MoveCache(capacity=2)
+        games = [GeneralGame(board_size=size) for size in (3, 4, 5)]
+        cache.put(games[0], SOSGame.BLUE, "m", (0, 0, "S"))
+        cache.put(games[1], SOSGame.BLUE, "m", (0, 0, "S"))
+        cache.get(games[0], SOSGame.BLUE, "m")
+        cache.put(games[2], SOSGame.BLUE, "m", (0, 0, "S"))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(games[1], SOSGame.BLUE, "m"))
+        self.assertIsNotNone(cache.get(games[0], SOSGame.BLUE, "m"))
+
+    def test_persistent_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "moves.sqlite")
+            cache = MoveCache(path=path)
+            cache.put(GeneralGame(board_size=3), SOSGame.BLUE, "m", (2, 1, "O"))
+            cache.close()
+            cache = MoveCache(path=path)
+            self.addCleanup(cache.close)
+            player = self._player(cache=cache, model="m")
+            self.assertEqual(player.get_move(GeneralGame(board_size=3)), (2, 1, "O"))
+            self.assertEqual(cache.stats["disk_hits"], 1)
+            self.assertEqual(self.server.requests, [])
+
+
+class TestLLMFallback(LLMServerTestCase):
+    def test_scoring_move_skips_server(self):
+        game = GeneralGame(board_size=3)
+        game.make_move(0, 0, "S")
+        game.make_move(0, 1, "O")
+        self.assertEqual(self._player().get_move(game), (0, 2, "S"))
+        self.assertEqual(self.server.requests, [])
+
+    def test_last_cell_skips_server(self):
+        game = GeneralGame(board_size=3)
+        for row, col in [(r, c) for r in range(3) for c in range(3)][:-1]:
+            game.make_move(row, col, "O")
+        self.assertEqual(self._player().get_move(game), (2, 2, "S"))
+        self.assertEqual(self.server.requests, [])
+
+    def test_invalid_replies_fall_back_to_engine(self):
+        self.server.replies = ["no idea"]
+        game = GeneralGame(board_size=3)
+        move = self._player().get_move(game)
+        self.assertTrue(game.make_move(*move))
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_slow_server_falls_back_within_budget(self):
+        self.server.replies = [("1,1,S", 5.0)]
+        game = GeneralGame(board_size=3)
+        started = time.perf_counter()
+        move = self._player(move_budget=0.3).get_move(game)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertTrue(game.make_move(*move))
+
+    def test_no_fallback_raises(self):
+        self.server.replies = ["no idea"]
+        with self.assertRaises(RuntimeError):
+            self._player(fallback=None).get_move(GeneralGame(board_size=3))
+
+
+class TestLLMStreaming(LLMServerTestCase):
+    def test_stops_reading_at_first_valid_move(self):
+        self.server.replies = [("2,1,O because it sets up the next turn" * 5, 0.05)]
+        started = time.perf_counter()
+        move = self._player().get_move(GeneralGame(board_size=3))
+        self.assertEqual(move, (2, 1, "O"))
+        self.assertTrue(self.server.requests[0]["stream"])
+        # The whole reply would take over four seconds to arrive.
+        self.assertLess(time.perf_counter() - started, 2.0)
+        # The server sees the dropped connection at its next write.
+        waited = time.perf_counter() + 2.0
+        while not self.server.dropped and time.perf_counter() < waited:
+            time.sleep(0.01)
+        self.assertEqual(self.server.dropped, 1)
+
+    def test_reads_unframed_stream_as_it_arrives(self):
+        self.server.chunked = False
+        self.server.replies = [("2,1,O because it sets up the next turn", 0.2)]
+        started = time.perf_counter()
+        move = self._player().get_move(GeneralGame(board_size=3))
+        self.assertEqual(move, (2, 1, "O"))
+        # Waiting for 512 bytes of events would take over a second.
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_skips_invalid_moves_in_stream(self):
+        game = GeneralGame(board_size=3)
+        game.make_move(1, 1, "O")
+        self.server.replies = ["1,1,S is taken, so 0,2,O"]
+        self.assertEqual(self._player().get_move(game), (0, 2, "O"))
+
+    def test_whole_reply_without_move_is_retried(self):
+        self.server.replies = ["thinking...", "1,2,S"]
+        self.assertEqual(
+            self._player().get_move(GeneralGame(board_size=3)), (1, 2, "S")
+        )
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_async_player_streams(self):
+        self.server.replies = [("0,0,S and more words after it" * 5, 0.05)]
+        started = time.perf_counter()
+        move = self._player(player_class=AsyncLLMPlayer, candidates=2).get_move(
+            GeneralGame(board_size=3)
+        )
+        self.assertEqual(move, (0, 0, "S"))
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+    def test_without_streaming(self):
+        self.assertEqual(
+            self._player(stream=False).get_move(GeneralGame(board_size=3)),
+            (1, 1, "S"),
+        )
+        self.assertFalse(self.server.requests[0]["stream"])
+
+
+class TestAsyncLLMPlayerErrors(unittest.TestCase):
+    def _move(self, reply, **kwargs):
+        server = RawReplyServer(reply)
+        self.addCleanup(server.stop)
+        for player_class in (LLMPlayer, AsyncLLMPlayer):
+            player = player_class(SOSGame.BLUE, cache=False, **kwargs)
+            player.api_url = server.url
+            game = GeneralGame(board_size=3)
+            move = player.get_move(game)
+            self.assertTrue(game.make_move(*move), player_class.__name__)
+
+    def test_reply_cut_short_falls_back(self):
+        self._move(
+            b"HTTP/1.1 200 OK\r\nContent-Length: 500\r\n\r\n" b'{"choi', stream=False
+        )
+
+    def test_unexpected_json_falls_back(self):
+        body = b'{"choices": null}'
+        self._move(
+            b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+            stream=False,
+        )
+
+    def test_unexpected_event_falls_back(self):
+        self._move(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n"
+            b"data: []\n\ndata: [DONE]\n\n"
+        )
+
+    def test_empty_stream_is_no_connection_error(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self._move(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n"
+                b"data: [DONE]\n\n"
+            )
+        self.assertNotIn("Connection Error", output.getvalue())
+
+
 if __name__ == "__main__":
     unittest.main()
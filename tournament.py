@@ -0,0 +1,311 @@
+# Headless tournament runner: plays players against each other in worker
+# processes, streams results to a JSON lines file and rates them with Elo.
+import argparse
+import ast
+import concurrent.futures
+import importlib
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from SOSGame import SOSGame, SimpleGame, GeneralGame
+
+# Short names for the bundled players as (module, class).
+PLAYER_TYPES = {
+    "computer": ("player", "ComputerPlayer"),
+    "heuristic": ("player", "HeuristicPlayer"),
+    "search": ("player", "SearchPlayer"),
+    "mcts": ("mcts_player", "MCTSPlayer"),
+    "solver": ("solver", "SolverPlayer"),
+    "llm": ("llm_player", "LLMPlayer"),
+    "llm_async": ("llm_player", "AsyncLLMPlayer"),
+}
+
+GAME_CLASSES = {SOSGame.SIMPLE: SimpleGame, SOSGame.GENERAL: GeneralGame}
+
+BASE_RATING = 1500.0
+BOOTSTRAP_SAMPLES = 200
+
+
+# Build a player from a spec "name[:key=value,...]", where name is one of
+# PLAYER_TYPES or a "module.Class" path to any Player subclass. Values are
+# Python literals, or plain strings if they do not parse as one.
+def make_player(spec, color):
+    name, _, options = spec.partition(":")
+    if name in PLAYER_TYPES:
+        module_name, class_name = PLAYER_TYPES[name]
+    else:
+        module_name, _, class_name = name.rpartition(".")
+        if not module_name:
+            raise ValueError(f"Unknown player: {name}")
+    player_class = getattr(importlib.import_module(module_name), class_name)
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return player_class(color, **kwargs)
+
+
+# Play one game and return its result as a dict. A player that raises or
+# returns an illegal move forfeits the game.
+def play_game(job):
+    blue_spec, red_spec, board_size, game_mode, seed = job
+    random.seed(seed)
+    players = {
+        SOSGame.BLUE: make_player(blue_spec, SOSGame.BLUE),
+        SOSGame.RED: make_player(red_spec, SOSGame.RED),
+    }
+    game = GAME_CLASSES[game_mode](board_size=board_size)
+    winner = None
+    forfeit = None
+    error = None
+    started = time.perf_counter()
+    try:
+        while not game.game_over:
+            mover = game.current_player
+            try:
+                move = players[mover].get_move(game)
+            except Exception as exc:
+                move = None
+                error = f"{type(exc).__name__}: {exc}"
+            if move is None or not game.make_move(*move):
+                forfeit = mover
+                winner = SOSGame.RED if mover == SOSGame.BLUE else SOSGame.BLUE
+                break
+        else:
+            winner = game.winner
+    finally:
+        for player in players.values():
+            close = getattr(player, "close", None)
+            if close is not None:
+                close()
+    return {
+        "blue": blue_spec,
+        "red": red_spec,
+        "board_size": board_size,
+        "game_mode": game_mode,
+        "seed": seed,
+        "winner": winner,
+        "blue_score": game.blue_score,
+        "red_score": game.red_score,
+        "moves": len(game.move_history),
+        "forfeit": forfeit,
+        "error": error,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+# Get the game jobs for a round robin: every pair of players plays the
+# given number of games per board size and mode, swapping colors each game.
+def schedule(specs, board_sizes, game_modes, games, seed=None):
+    rng = random.Random(seed)
+    jobs = []
+    for first, second in itertools.combinations(specs, 2):
+        for board_size in board_sizes:
+            for game_mode in game_modes:
+                for i in range(games):
+                    blue, red = (first, second) if i % 2 == 0 else (second, first)
+                    jobs.append((blue, red, board_size, game_mode, rng.getrandbits(32)))
+    return jobs
+
+
+# Play the jobs in a pool of worker processes, writing each result to the
+# output file as a JSON line as soon as it arrives. Yields the results.
+# The workers are not daemonic, so players that start processes of their
+# own, like MCTSPlayer with several workers, can run in them.
+def run_jobs(jobs, workers, output=None):
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_game, job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+            yield result
+
+
+# Read results written by run_jobs.
+def load_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Get the results that count for ratings: games a player lost by raising
+# an error say nothing about its strength, so they are left out.
+def rated_results(results):
+    return [result for result in results if not result.get("error")]
+
+
+# Get (blue points, red points) for a game: 1 for a win, 0.5 each for a
+# draw.
+def _game_points(result):
+    if result["winner"] == SOSGame.BLUE:
+        return 1.0, 0.0
+    if result["winner"] == SOSGame.RED:
+        return 0.0, 1.0
+    return 0.5, 0.5
+
+
+# Fit Bradley-Terry strengths to the results by minorization-maximization
+# and convert them to Elo ratings averaging BASE_RATING. Every pair that
+# played gets one extra virtual draw, so unbeaten players stay finite.
+# Games ending in an error are not rated; with no rated games the result
+# is empty.
+def fit_elo(results, iterations=200):
+    results = rated_results(results)
+    if not results:
+        return {}
+    players = sorted({r["blue"] for r in results} | {r["red"] for r in results})
+    wins = {player: 0.0 for player in players}
+    pair_games = {}
+    for result in results:
+        blue_points, red_points = _game_points(result)
+        wins[result["blue"]] += blue_points
+        wins[result["red"]] += red_points
+        pair = tuple(sorted((result["blue"], result["red"])))
+        pair_games[pair] = pair_games.get(pair, 0) + 1
+    for (first, second), count in list(pair_games.items()):
+        wins[first] += 0.5
+        wins[second] += 0.5
+        pair_games[(first, second)] = count + 1
+
+    strengths = {player: 1.0 for player in players}
+    for _ in range(iterations):
+        updated = {}
+        for player in players:
+            total = 0.0
+            for (first, second), count in pair_games.items():
+                if player in (first, second):
+                    total += count / (strengths[first] + strengths[second])
+            updated[player] = wins[player] / total if total else 1.0
+        scale = math.exp(
+            sum(math.log(strength) for strength in updated.values()) / len(updated)
+        )
+        strengths = {player: strength / scale for player, strength in updated.items()}
+    return {
+        player: BASE_RATING + 400.0 * math.log10(strength)
+        for player, strength in strengths.items()
+    }
+
+
+# Get {player: (elo, low, high)} with a bootstrap confidence interval from
+# refitting on games resampled with replacement.
+def elo_with_intervals(results, confidence=0.95, samples=BOOTSTRAP_SAMPLES, seed=0):
+    results = rated_results(results)
+    ratings = fit_elo(results)
+    rng = random.Random(seed)
+    resampled = {player: [] for player in ratings}
+    for _ in range(samples):
+        sample = [rng.choice(results) for _ in results]
+        for player, rating in fit_elo(sample).items():
+            resampled[player].append(rating)
+    tail = (1.0 - confidence) / 2
+    intervals = {}
+    for player, rating in ratings.items():
+        values = sorted(resampled[player])
+        if not values:
+            intervals[player] = (rating, rating, rating)
+            continue
+        low = values[int(tail * (len(values) - 1))]
+        high = values[int(math.ceil((1.0 - tail) * (len(values) - 1)))]
+        intervals[player] = (rating, low, high)
+    return intervals
+
+
+# Format a standings table with games, score, Elo and its interval. Games
+# ending in an error are counted separately and left out of the table.
+def format_report(results, seconds=None):
+    lines = []
+    games = {}
+    points = {}
+    errors = {}
+    for result in results:
+        if result.get("error"):
+            player = result[result["forfeit"]] if result.get("forfeit") else "?"
+            errors[player] = errors.get(player, 0) + 1
+    for result in rated_results(results):
+        blue_points, red_points = _game_points(result)
+        for player, scored in (
+            (result["blue"], blue_points),
+            (result["red"], red_points),
+        ):
+            games[player] = games.get(player, 0) + 1
+            points[player] = points.get(player, 0.0) + scored
+    ratings = elo_with_intervals(results)
+    if ratings:
+        lines.append(
+            f"{'player':30} {'games':>6} {'score':>7} {'elo':>6}  95% interval"
+        )
+    for player, (rating, low, high) in sorted(
+        ratings.items(), key=lambda item: -item[1][0]
+    ):
+        score = 100.0 * points[player] / games[player]
+        lines.append(
+            f"{player:30} {games[player]:6d} {score:6.1f}% {rating:6.0f}"
+            f"  [{low:.0f}, {high:.0f}]"
+        )
+    forfeits = sum(1 for result in results if result["forfeit"])
+    summary = f"{len(results)} games, {forfeits} forfeits"
+    if errors:
+        summary += f", {sum(errors.values())} errors not rated"
+    if seconds:
+        summary += f", {len(results) / seconds:.1f} games/s"
+    lines.append(summary)
+    for player, count in sorted(errors.items()):
+        lines.append(f"  {player}: {count} games lost to errors")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an SOS player tournament.")
+    parser.add_argument(
+        "players",
+        nargs="*",
+        help="player specs, e.g. computer heuristic search:time_limit=0.1",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8])
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(GAME_CLASSES),
+        default=[SOSGame.SIMPLE, SOSGame.GENERAL],
+    )
+    parser.add_argument("--games", type=int, default=10, help="games per pairing")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--output", default="tournament.jsonl")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--report", metavar="RESULTS", help="only report on an existing results file"
+    )
+    args = parser.parse_args(argv)
+
+    if args.report:
+        print(format_report(load_results(args.report)))
+        return
+    if len(args.players) < 2:
+        parser.error("need at least two players")
+
+    jobs = schedule(args.players, args.sizes, args.modes, args.games, args.seed)
+    results = []
+    started = time.perf_counter()
+    with open(args.output, "w") as output:
+        for result in run_jobs(jobs, args.workers, output):
+            results.append(result)
+            if len(results) % 100 == 0:
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{len(results)}/{len(jobs)} games, "
+                    f"{len(results) / elapsed:.1f} games/s",
+                    file=sys.stderr,
+                )
+    print(format_report(results, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
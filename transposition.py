@@ -0,0 +1,85 @@
+# Transposition table for caching search results by position hash.
+
+
+# Bounded hash table of search results keyed by SOSGame.position_hash.
+class TranspositionTable:
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    # Create a table with room for at least the given number of entries.
+    def __init__(self, size=1 << 20):
+        if size < 1:
+            raise ValueError("Transposition table size must be positive")
+        slot_count = 1
+        while slot_count < size:
+            slot_count <<= 1
+        self._mask = slot_count - 1
+        self._slots = [None] * slot_count
+        self._generation = 0
+        self._stored = 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def capacity(self):
+        return len(self._slots)
+
+    @property
+    def stored(self):
+        return self._stored
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    # Start a new search so entries from older searches are replaced first.
+    def new_search(self):
+        self._generation += 1
+
+    # Look up a position, returning (depth, value, flag, move) or None.
+    def probe(self, key):
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry[1:5]
+        self._misses += 1
+        return None
+
+    # Check whether a position is stored, without counting a probe.
+    def __contains__(self, key):
+        entry = self._slots[key & self._mask]
+        return entry is not None and entry[0] == key
+
+    # Store a search result. A slot holding a different position is only
+    # overwritten by an equal or deeper search or when it is from an older
+    # search, so expensive results survive collisions within one search.
+    def store(self, key, depth, value, flag=EXACT, move=None):
+        slot = key & self._mask
+        entry = self._slots[slot]
+        if entry is None:
+            self._stored += 1
+        elif entry[0] != key and entry[5] == self._generation and entry[1] > depth:
+            return False
+        self._slots[slot] = (key, depth, value, flag, move, self._generation)
+        return True
+
+    # Remember a position without a search result, returning False if it was
+    # already stored. Useful for deduplicating positions.
+    def add(self, key):
+        if key in self:
+            return False
+        self.store(key, 0, None)
+        return True
+
+    # Remove all entries and reset counters.
+    def clear(self):
+        self._slots = [None] * len(self._slots)
+        self._generation = 0
+        self._stored = 0
+        self._hits = 0
+        self._misses = 0